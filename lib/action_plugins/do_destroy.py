@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+# Task spec:
+#
+# - do_destroy:
+#     # Inventory hosts whose droplets to destroy; each host's `fqdn`,
+#     # `region_id` and `do_volumes` vars are used to find resources
+#     hosts: "{{ ansible_play_hosts }}"
+#     # Optional: also destroy droplets with this tag
+#     tag_name: my-cluster
+#     # Optional: remove IPA host entries and their DNS records
+#     ipa_host: "{{freeipa_master_fqdn}}"
+#     ipa_user: "{{ipa_user}}"
+#     ipa_pass: "{{freeipa_admin_password}}"
+#     # Optional: print planned deletions without deleting anything
+#     dry_run: no
+#     # Optional: max concurrent API steps
+#     max_workers: 8
+#   run_once: true
+#
+# Droplets and volumes are listed once.  Volumes to destroy are those
+# named in a host's `do_volumes` list plus any attached to a destroyed
+# droplet.  Volumes are detached, and droplets and volumes are deleted
+# concurrently.  IPA host entries are removed alongside; a droplet is
+# only deleted once its own IPA host entry removal has ended, and the
+# `ipa_host` droplet once all have, so that the IPA server is still up.
+# IPA failures don't hold up or fail the deletions; they are returned
+# in `ipa_failures`, with a warning.
+#
+# Returns:
+#
+# { changed: True,
+#   ipa_failures: {},
+#   plan: [
+#     'delete IPA host host2.example.com',
+#     'detach volume host2-data from host2.example.com',
+#     'delete volume host2-data',
+#     'delete droplet host2.example.com',
+#   ],
+#   timeline: [ ... ],
+#   rate_limit: { calls: 9, retries: 0, waited: 0.0, per_call: [...] }
+# }
+
+__metaclass__ = type
+
+from ansible.plugins.action import ActionBase
+from ansible.module_utils.parsing.convert_bool import boolean
+import os, sys
+
+try:
+    from dopy.manager import DoError
+except ImportError as e:
+    sys.exit("failed=True msg='`dopy` library required for this script'")
+
+from do_api import RateLimitedDoManager, MAX_RETRIES
+from stepgraph import StepGraph
+from ipa import IPASession, IPASessionError
+
+class ActionModule(ActionBase):
+
+    def run(self, tmp=None, task_vars=dict()):
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        args = self._task.args
+
+        # Get DO API token and manager object
+        api_token = args.get(
+            'api_token', os.environ.get('DO_API_KEY', None))
+        if api_token is None:
+            return dict(failed=True,
+                        msg=("No 'api_token' option or 'DO_API_KEY' "
+                             "environment variable set"))
+        manager = RateLimitedDoManager(
+            api_token, bucket_file=args.get('rate_limit_file', None),
+            max_retries=int(args.get('api_retries', MAX_RETRIES)))
+
+        # Read arguments
+        hosts = args.get('hosts', None)
+        if not isinstance(hosts, list):
+            return dict(failed=True,
+                        msg=("Required list argument 'hosts' not found"))
+        tag_name = args.get('tag_name', None)
+        dry_run = boolean(args.get('dry_run', False)) \
+                  or self._play_context.check_mode
+        max_workers = int(args.get('max_workers', 8))
+
+        hostvars = task_vars['hostvars']
+        names = dict((hostvars[h]['fqdn'], h) for h in hosts)
+        volume_names = set(
+            (v['name'], hostvars[h]['region_id']) for h in hosts
+            for v in (hostvars[h].get('do_volumes', None) or []))
+
+        # List all resources once
+        try:
+            droplets = [ d for d in manager.all_droplets()
+                         if d['name'] in names ]
+            if tag_name is not None:
+                seen = set(d['id'] for d in droplets)
+                droplets.extend(d for d in manager.all_droplets(tag_name)
+                                if d['id'] not in seen)
+            droplet_ids = dict((d['id'], d) for d in droplets)
+            volumes = [ v for v in manager.all_volumes()
+                        if (v['name'], v['region']['slug']) in volume_names
+                        or set(v.get('droplet_ids', [])) & set(droplet_ids) ]
+        except DoError as e:
+            return dict(failed=True, msg=str(e),
+                        rate_limit=manager.stats())
+
+        # Plan and build the step graph
+        graph = StepGraph()
+        plan = []
+
+        ipa_steps = {}
+        if args.get('ipa_host', None):
+            ipa = IPASession(
+                args['ipa_host'], args.get('ipa_user', 'admin'),
+                args.get('ipa_pass', None),
+                validate_certs=boolean(args.get('validate_certs', True)))
+
+            def ipa_host_del(fqdn):
+                try:
+                    ipa.call('host_del', [fqdn], dict(updatedns=True))
+                except IPASessionError as e:
+                    if e.code != IPASession.NOT_FOUND:
+                        raise
+                    return False
+                return True
+
+            graph.add('ipa-login', ipa.login)
+            for fqdn in sorted(names):
+                plan.append('delete IPA host %s' % fqdn)
+                step = 'ipa:%s' % fqdn
+                graph.add(step, lambda fqdn=fqdn: ipa_host_del(fqdn),
+                          deps=['ipa-login'], host=names[fqdn])
+                ipa_steps[fqdn] = step
+
+        def detach(volume, droplet):
+            action = manager.detach_volume(
+                volume['id'], droplet['id'], volume['region']['slug'])
+            manager.wait_action(action['id'])
+
+        detach_steps = dict((d['id'], []) for d in droplets)
+        for v in volumes:
+            deps = []
+            for droplet_id in v.get('droplet_ids', []):
+                droplet = droplet_ids.get(droplet_id, None)
+                if droplet is None:
+                    continue
+                plan.append('detach volume %s from %s' % (
+                    v['name'], droplet['name']))
+                step = 'detach:%s:%s' % (v['name'], droplet['name'])
+                graph.add(step, lambda v=v, droplet=droplet:
+                          detach(v, droplet),
+                          host=names.get(droplet['name']))
+                detach_steps[droplet_id].append(step)
+                deps.append(step)
+            plan.append('delete volume %s' % v['name'])
+            graph.add('delete-volume:%s' % v['name'],
+                      lambda v=v: manager.delete_volume(v['id']), deps=deps)
+
+        for d in droplets:
+            if d['name'] == args.get('ipa_host', None):
+                after = sorted(ipa_steps.values()) + ['ipa-login']
+            else:
+                after = [ipa_steps[d['name']]] if d['name'] in ipa_steps else []
+            plan.append('delete droplet %s' % d['name'])
+            graph.add('delete-droplet:%s' % d['name'],
+                      lambda d=d: manager.delete_droplet(d['id']),
+                      deps=detach_steps[d['id']], after=after,
+                      host=names.get(d['name']))
+
+        if dry_run:
+            return dict(changed=bool(plan), plan=plan,
+                        rate_limit=manager.stats())
+
+        graph.run(max_workers)
+        failures = graph.failures()
+        ipa_failures = dict((k, v) for k, v in failures.items()
+                            if k == 'ipa-login' or k in ipa_steps.values())
+        failures = dict((k, v) for k, v in failures.items()
+                        if k not in ipa_failures)
+        result = dict(
+            changed=bool(plan),
+            failed=False,
+            plan=plan,
+            ipa_failures=ipa_failures,
+            timeline=graph.timeline(),
+            rate_limit=manager.stats(),
+        )
+        if ipa_failures:
+            result['warnings'] = [
+                "IPA host entries not removed:  %s" % '; '.join(
+                    '%s: %s' % i for i in sorted(ipa_failures.items()))]
+        if failures:
+            result.update(
+                failed=True,
+                msg="Teardown steps failed:  %s" % '; '.join(
+                    '%s: %s' % i for i in sorted(failures.items())))
+        return result
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+# Task spec:
+#
+# - do_droplet_create:
+#     # Inventory hosts to create droplets for; each host's `fqdn`,
+#     # `size_id`, `region_id`, `image_id` and `user_data` vars are
+#     # used as droplet settings, as is `private_networking` if set
+#     hosts: "{{ ansible_play_hosts }}"
+#     # SSH key IDs to install in new droplets
+#     ssh_key_ids:
+#       - 1234567
+#     # Optional: enable private networking on new droplets, unless
+#     # overridden by the host's `private_networking` var
+#     private_networking: false
+#     # Optional: tags to put on new droplets
+#     tags:
+#       - my-cluster
+#     # Optional: seconds to wait for all droplets to become active
+#     wait_timeout: 500
+#     # Optional: seconds between droplet status polls
+#     poll_interval: 5
+#     # Optional: max concurrent API steps
+#     max_workers: 8
+#   run_once: true
+#
+# Hosts whose droplet already exists are left alone.  Hosts with
+# identical droplet settings are created with a single multi-droplet
+# API request; all droplets' status is then polled with one droplet
+# listing per interval until every droplet is active.
+#
+# Block storage volumes listed in each host's `do_volumes` var are
+# created and attached:
+#
+# do_volumes:
+#   - name: host1-data
+#     size: 4
+#
+# Provisioning runs as a dependency graph of steps (see
+# `lib/python/stepgraph.py`), so volumes are created while droplets
+# boot, and each volume is attached as soon as both it and its
+# droplet are ready.
+#
+# Returns a dict of inventory_hostname:info:
+#
+# { changed: True,
+#   created: [ host2 ],
+#   d: {
+#     host1: {
+#       name: 'host1.example.com',
+#       id: 1234567,
+#       ip_address:  '192.168.42.12',
+#       private_ip_address:  '10.132.42.12',
+#       status: 'active',
+#     },
+#     [...]
+#   },
+#   polls: 12,
+#   elapsed: 62.3,
+#   timeline: [
+#     { step: 'create:host1', host: host1, status: 'ok',
+#       start: 0.31, end: 1.2, duration: 0.89 },
+#     [...]
+#   ],
+#   rate_limit: { calls: 14, retries: 0, waited: 0.0, per_call: [...] }
+# }
+
+__metaclass__ = type
+
+from ansible.plugins.action import ActionBase
+from ansible.module_utils.parsing.convert_bool import boolean
+import os, sys, time
+
+try:
+    from dopy.manager import DoError
+except ImportError as e:
+    sys.exit("failed=True msg='`dopy` library required for this script'")
+
+from do_api import RateLimitedDoManager, DropletPoller, MAX_RETRIES
+from stepgraph import StepGraph
+
+# Droplet keys to return to the play
+droplet_keys = ('name', 'id', 'status', 'ip_address', 'private_ip_address',
+                'ip6_address')
+
+class ActionModule(ActionBase):
+
+    def run(self, tmp=None, task_vars=dict()):
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        args = self._task.args
+
+        # Get DO API token and manager object
+        api_token = args.get(
+            'api_token', os.environ.get('DO_API_KEY', None))
+        if api_token is None:
+            return dict(failed=True,
+                        msg=("No 'api_token' option or 'DO_API_KEY' "
+                             "environment variable set"))
+        manager = RateLimitedDoManager(
+            api_token, bucket_file=args.get('rate_limit_file', None),
+            max_retries=int(args.get('api_retries', MAX_RETRIES)))
+
+        # Read arguments
+        hosts = args.get('hosts', None)
+        if not isinstance(hosts, list):
+            return dict(failed=True,
+                        msg=("Required list argument 'hosts' not found"))
+        ssh_key_ids = args.get('ssh_key_ids', [])
+        if not isinstance(ssh_key_ids, list):
+            ssh_key_ids = [ ssh_key_ids ]
+        ssh_key_ids = [ int(k) for k in ssh_key_ids ]
+        tags = args.get('tags', None)
+        private_networking = args.get('private_networking', False)
+        wait_timeout = int(args.get('wait_timeout', 500))
+        poll_interval = int(args.get('poll_interval', 5))
+        max_workers = int(args.get('max_workers', 8))
+
+        # Map droplet names to hosts, and group hosts by droplet
+        # settings so that each group may be created in one request
+        hostvars = task_vars['hostvars']
+        names = {}
+        regions = {}
+        volumes = {}
+        groups = {}
+        for host in hosts:
+            hv = hostvars[host]
+            name = hv['fqdn']
+            names[name] = host
+            regions[host] = hv['region_id']
+            volumes[host] = hv.get('do_volumes', None) or []
+            spec = (hv['size_id'], hv['image_id'], hv['region_id'],
+                    hv.get('user_data', '') or '',
+                    boolean(hv.get('private_networking', private_networking)))
+            groups.setdefault(spec, []).append(name)
+
+        start = time.time()
+        deadline = start + wait_timeout
+        try:
+            existing = set(d['name'] for d in manager.all_droplets())
+            existing_volumes = dict(
+                ((v['name'], v['region']['slug']), v)
+                for v in manager.all_volumes())
+        except DoError as e:
+            return dict(failed=True, msg=str(e),
+                        rate_limit=manager.stats())
+        to_create = [ n for n in names if n not in existing ]
+        vols_to_create = [
+            (h, v['name']) for h in hosts for v in volumes[h]
+            if (v['name'], regions[h]) not in existing_volumes ]
+
+        if self._play_context.check_mode:
+            return dict(changed=bool(to_create or vols_to_create),
+                        created=sorted(names[n] for n in to_create),
+                        created_volumes=sorted(v for h, v in vols_to_create),
+                        rate_limit=manager.stats())
+
+        # Build the step graph
+        graph = StepGraph()
+        poller = DropletPoller(manager, poll_interval)
+        create_step = {}
+        for (size, image, region, user_data, private), group in \
+                groups.items():
+            group = [ n for n in group if n in to_create ]
+            step = 'create:%s' % ','.join(names[n] for n in group)
+            for n in group:
+                create_step[n] = [ step ]
+            if group:
+                graph.add(step, lambda group=group, size=size, image=image,
+                          region=region, user_data=user_data,
+                          private=private:
+                          manager.new_droplets(
+                              group, size, image, region,
+                              ssh_key_ids=ssh_key_ids,
+                              user_data=user_data, tags=tags,
+                              private_networking=private))
+
+        def ensure_volume(host, vol):
+            key = (vol['name'], regions[host])
+            if key in existing_volumes:
+                return existing_volumes[key]
+            return manager.new_volume(
+                vol['name'], vol['size'], regions[host],
+                description=vol.get(
+                    'description', '%s volume for %s' % (vol['name'], host)))
+
+        def attach_volume(host, name, vol_step):
+            droplet = graph.result('active:%s' % host)
+            volume = graph.result(vol_step)
+            if droplet['id'] in volume.get('droplet_ids', []):
+                return False
+            action = manager.attach_volume(
+                volume['id'], droplet['id'], regions[host])
+            manager.wait_action(
+                action['id'], timeout=max(1, deadline - time.time()))
+            return True
+
+        for name, host in names.items():
+            graph.add('active:%s' % host,
+                      lambda name=name: poller.wait_active(name, deadline),
+                      deps=create_step.get(name, []), host=host)
+            for vol in volumes[host]:
+                vol_step = 'volume:%s:%s' % (host, vol['name'])
+                graph.add(vol_step,
+                          lambda host=host, vol=vol: ensure_volume(host, vol),
+                          host=host)
+                graph.add('attach:%s:%s' % (host, vol['name']),
+                          lambda host=host, name=vol['name'],
+                          vol_step=vol_step:
+                          attach_volume(host, name, vol_step),
+                          deps=['active:%s' % host, vol_step], host=host)
+
+        ok = graph.run(max_workers)
+        if not ok:
+            return dict(
+                failed=True,
+                msg="Provisioning steps failed:  %s" % '; '.join(
+                    '%s: %s' % i for i in sorted(graph.failures().items())),
+                created=sorted(names[n] for n in to_create),
+                timeline=graph.timeline(),
+                rate_limit=manager.stats())
+
+        attached = sorted(
+            s.split(':', 1)[1] for s in graph.order
+            if s.startswith('attach:') and graph.result(s))
+        droplets = dict((n, graph.result('active:%s' % h))
+                        for n, h in names.items())
+
+        return dict(
+            changed=bool(to_create or vols_to_create or attached),
+            failed=False,
+            created=sorted(names[n] for n in to_create),
+            created_volumes=sorted(v for h, v in vols_to_create),
+            attached_volumes=attached,
+            d=dict( [(names[n], dict((k, d.get(k, None))
+                                     for k in droplet_keys))
+                     for n, d in droplets.items()] ),
+            polls=poller.polls,
+            elapsed=round(time.time() - start, 1),
+            timeline=graph.timeline(),
+            rate_limit=manager.stats(),
+        )
@@ -9,14 +9,37 @@
 #     names:
 #       - host1.example.com
 #       - host2.example.com
+#     # Optional: request budget state file shared by all forks
+#     # (default from `DO_RATE_LIMIT_FILE` env or a per-token tmp file)
+#     rate_limit_file: /tmp/do-ratelimit.json
+#     # Optional: max retries of rate-limited or failed API calls
+#     api_retries: 6
 #
-# With name arg, returns droplet info (plus 'changed' attribute):
+# With name arg, returns droplet info (plus 'changed' attribute), and
+# sets the `do_droplet_facts` fact with the droplet's authoritative
+# network configuration.  Facts are kept in the fact cache, so later
+# plays that only need addresses may run with `gather_facts: False`.
+# Filters prefer these addresses to gathered facts, but ignore facts
+# whose droplet `id` differs from the host's current droplet (see
+# `lib/python/hostmap.py`), e.g. left over from a rebuilt droplet.
 #
 # { changed: False,
 #   name: 'host1.example.com',
 #   id: 1234567,
 #   ip_address:  '192.168.42.12',
 #   [...]
+#   rate_limit: { calls: 1, retries: 0, waited: 0.0, per_call: [...] }
+#   ansible_facts: {
+#     do_droplet_facts: {
+#       id: 1234567,
+#       name: 'host1.example.com',
+#       region: 'nyc1',
+#       size: '1gb',
+#       public_ipv4: '192.168.42.12',
+#       private_ipv4: '10.132.42.12',
+#       public_ipv6: '2604:a880:800:10::1',
+#     }
+#   }
 # }
 #
 # With names arg, returns dict of name:info:
@@ -32,7 +55,8 @@
 #     host2.example.com: {
 #       [...]
 #     }
-#   }
+#   },
+#   rate_limit: { calls: 1, retries: 0, waited: 0.0, per_call: [...] }
 # }
 
 __metaclass__ = type
@@ -41,10 +65,26 @@ from ansible.plugins.action import ActionBase
 import os, sys
 
 try:
-    from dopy.manager import DoManager
+    from dopy.manager import DoError
 except ImportError as e:
     sys.exit("failed=True msg='`dopy` library required for this script'")
 
+from do_api import RateLimitedDoManager, MAX_RETRIES, droplet_addresses
+
+def droplet_facts(droplet):
+    """Extract network and placement facts from droplet info"""
+    droplet_addresses(droplet)
+    return dict(
+        id=droplet['id'],
+        name=droplet['name'],
+        status=droplet.get('status', None),
+        region=droplet.get('region', {}).get('slug', None),
+        size=droplet.get('size_slug', None),
+        public_ipv4=droplet.get('ip_address', None) or None,
+        private_ipv4=droplet.get('private_ip_address', None),
+        public_ipv6=droplet.get('ip6_address', None),
+    )
+
 class ActionModule(ActionBase):
 
     def run(self, tmp=None, task_vars=dict()):
@@ -60,7 +100,9 @@ class ActionModule(ActionBase):
             return dict(failed=True,
                         msg=("No 'api_token' option or 'DO_API_KEY' "
                              "environment variable set"))
-        manager = DoManager(None, api_token, api_version=2)
+        manager = RateLimitedDoManager(
+            api_token, bucket_file=args.get('rate_limit_file', None),
+            max_retries=int(args.get('api_retries', MAX_RETRIES)))
 
         # Read arguments
         if 'name' in args:
@@ -76,16 +118,24 @@ class ActionModule(ActionBase):
                         msg=("Required argument 'name' or 'names' not found"))
 
         # Get droplet info
-        droplets = [ d for d in manager.all_active_droplets()
-                     if d['name'] in names ]
+        try:
+            droplets = [ d for d in manager.all_active_droplets()
+                         if d['name'] in names ]
+        except DoError as e:
+            return dict(failed=True, msg=str(e),
+                        rate_limit=manager.stats())
 
         # If a single 'name', return the droplet info dict
         if 'name' in args:
             if len(droplets) != 1:
                 return dict(failed=True,
-                            msg=("No droplet named '{}' found".format(name)))
+                            msg=("No droplet named '{}' found".format(name)),
+                            rate_limit=manager.stats())
             droplet = droplets[0]
             droplet['changed'] = False
+            droplet['rate_limit'] = manager.stats()
+            droplet['ansible_facts'] = dict(
+                do_droplet_facts=droplet_facts(droplet))
             return droplet
 
         # Otherwise, return a dict of name:info
@@ -93,4 +143,5 @@ class ActionModule(ActionBase):
             changed=False,
             failed=False,
             d=dict( [(d['name'], d) for d in droplets] ),
+            rate_limit=manager.stats(),
         )
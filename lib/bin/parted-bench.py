@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Check and benchmark the parted module against sparse disk images
+#
+# The functions in `lib/modules/parted.py` are run outside Ansible, with
+# a stand-in for `AnsibleModule` that counts and times the parted
+# processes the module spawns.  First the parsing and formatting
+# functions are checked against canned parted output; then, if parted
+# is installed, each of a series of label/create/flag/remove steps is
+# run on fresh sparse images, with and without `native_read`, checking
+# after each step that `read_partition_table()` agrees with parted.
+#
+# Images are partitioned as plain files by default; with `--loop`
+# (root only) they are attached to loop devices first, as the
+# `disk-label` role sees real disks.  Ansible must be importable:
+#
+# PYTHONPATH=lib/python lib/bin/parted-bench.py --runs 5
+# PYTHONPATH=lib/python lib/bin/parted-bench.py --loop --json > before.json
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+import parted  # noqa: E402
+
+
+class BenchError(Exception):
+    pass
+
+
+class BenchModule(object):
+    """Stand-in for `AnsibleModule`, recording each command run."""
+
+    def __init__(self):
+        self.check_mode = False
+        self.commands = []
+
+    def run_command(self, command):
+        start = time.time()
+        proc = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+        out, err = proc.communicate()
+        self.commands.append((command, time.time() - start))
+        return proc.returncode, out, err
+
+    def fail_json(self, **kwargs):
+        raise BenchError(kwargs.get('msg', 'failed'))
+
+    def reset(self):
+        commands, self.commands = self.commands, []
+        return commands
+
+
+# Defaults of the module's argument_spec
+default_params = dict(
+    device=None, devices=None, workers=8, native_read=False, align='optimal',
+    number=None, unit='KiB', label=None, part_type=None, fs_type=None,
+    part_start='0%', part_end='100%', name=None, flags=None, layout=None,
+    state='info')
+
+# Steps run in order on each image, as (name, params); each step starts
+# from the table left by the previous one
+steps = [
+    ('info-unlabeled', dict(state='info')),
+    ('label', dict(state='present', label='gpt')),
+    ('create', dict(state='present', number=1, part_type='primary',
+                    fs_type='ext4', part_start='1MiB', part_end='50%')),
+    ('create-again', dict(state='present', number=1, part_type='primary',
+                          fs_type='ext4', part_start='1MiB', part_end='50%')),
+    ('name', dict(state='present', number=1, name='data')),
+    ('flag', dict(state='present', number=1, flags=['lvm'])),
+    ('unflag', dict(state='present', number=1, flags=['raid'])),
+    ('remove', dict(state='absent', number=1)),
+    ('relabel-msdos', dict(state='present', label='msdos')),
+    ('layout', dict(state='present', label='msdos', part_type='primary',
+                    fs_type='ext4', layout=[
+                        dict(number=1, start='1MiB', end='40%', flags=['boot']),
+                        dict(number=2, start='40%', end='100%',
+                             flags=['lvm'])])),
+    ('layout-again', dict(state='present', label='msdos', part_type='primary',
+                          fs_type='ext4', layout=[
+                              dict(number=1, start='1MiB', end='40%',
+                                   flags=['boot']),
+                              dict(number=2, start='40%', end='100%',
+                                   flags=['lvm'])])),
+    ('info', dict(state='info')),
+]
+
+# parted -m output for a GPT disk, in bytes
+sample_output = '''BYT;
+/dev/sdb:10737418240B:scsi:512:4096:gpt:ATA DISK:;
+1:1048576B:5368709119B:5367660544B:ext4:data:lvm;
+2:5368709120B:10736369663B:5367660544B:::boot, esp;
+'''
+
+
+def check_functions():
+    """Check parsing, formatting and script building without running parted;
+    return a list of failures."""
+
+    failures = []
+
+    def expect(what, got, want):
+        if got != want:
+            failures.append('%s: got %r, want %r' % (what, got, want))
+
+    for size, unit, want in [
+            (0, 'KiB', (0.0, 'kib')),
+            (512, 'B', (512.0, 'b')),
+            (1536, 'KiB', (1.5, 'kib')),
+            (10737418240, 'GiB', (10.0, 'gib')),
+            (10737418240, 'GB', (10.7, 'gb')),
+            (10737418240, 'compact', (10.7, 'gb')),
+            (123456789, 'MB', (123.0, 'mb'))]:
+        expect('format_disk_size(%d, %s)' % (size, unit),
+               parted.format_disk_size(size, unit), want)
+
+    info = parted.parse_partition_info(sample_output, 'B')
+    expect('generic', info['generic'], {
+        'dev': '/dev/sdb', 'size': 10737418240.0, 'unit': 'b', 'table': 'gpt',
+        'model': 'ATA DISK', 'logical_block': 512, 'physical_block': 4096})
+    expect('partitions', [(p['num'], p['begin'], p['end'], p['fstype'],
+                           p['name'], p['flags']) for p in info['partitions']],
+           [(1, 1048576.0, 5368709119.0, 'ext4', 'data', ['lvm']),
+            (2, 5368709120.0, 10736369663.0, '', '', ['boot', 'esp'])])
+    expect('script output before table',
+           parted.parse_partition_info('Warning: foo\n' + sample_output, 'B'),
+           info)
+
+    parts = info['partitions']
+    expect('existing partition script', parted.partition_script(
+        parts, 1, 'primary', 'ext4', '0%', '100%', 'data', ['lvm']), '')
+    expect('new partition script', parted.partition_script(
+        parts, 3, 'primary', 'ext4', '1MiB', '100%', 'home', ['raid']),
+        'mkpart primary ext4 1MiB 100% name 3 home set 3 raid on ')
+    expect('flags script', parted.partition_script(
+        parts, 2, None, '', '0%', '100%', None, ['boot']),
+        'set 2 esp off ')
+
+    return failures
+
+
+def compare_tables(device):
+    """Return the differences between `read_partition_table()` and parted's
+    print of `device`, or None if the native reader declines the table."""
+
+    native = parted.read_partition_table(device, 's')
+    if native is None:
+        return None
+    info = parted.get_device_info(device, 's')
+    if info['generic']['table'] == 'unknown':
+        return ['parted finds no table, native reads %s'
+                % native['generic']['table']]
+
+    diffs = []
+    for key in ('table', 'size', 'unit', 'logical_block'):
+        if native['generic'][key] != info['generic'][key]:
+            diffs.append('%s: native %r, parted %r' % (
+                key, native['generic'][key], info['generic'][key]))
+    keys = ('num', 'begin', 'end', 'size', 'fstype', 'name', 'flags')
+    native_parts = [tuple(p[k] for k in keys) for p in native['partitions']]
+    parted_parts = [tuple(p[k] for k in keys) for p in info['partitions']]
+    if native_parts != parted_parts:
+        diffs.append('partitions: native %r, parted %r' % (
+            native_parts, parted_parts))
+    return diffs
+
+
+def make_image(path, size, loop):
+    """Create a sparse image, attached to a loop device if `loop`; return
+    the device path."""
+
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    if not loop:
+        return path
+    return subprocess.check_output(
+        ['losetup', '--find', '--show', path],
+        universal_newlines=True).strip()
+
+
+def run_sequence(module, device, native):
+    """Run `steps` on `device`; return a list of (step, spawns, wall time,
+    table differences)."""
+
+    res = []
+    for name, step in steps:
+        params = dict(default_params, device=device, native_read=native,
+                      **step)
+        module.reset()
+        start = time.time()
+        parted.manage_device(parted.check_params(params))
+        elapsed = time.time() - start
+        spawns = len(module.reset())
+        res.append((name, spawns, elapsed, compare_tables(device)))
+        module.reset()
+    return res
+
+
+def summarize(results):
+    """Summarize per-run step results as a list of dicts per step and mode."""
+
+    summary = []
+    for native in (False, True):
+        runs = [r for n, r in results if n == native]
+        if not runs:
+            continue
+        for i, (name, _) in enumerate(steps):
+            times = [run[i][2] for run in runs]
+            spawns = [run[i][1] for run in runs]
+            diffs = [d for run in runs for d in (run[i][3] or [])]
+            summary.append(dict(
+                step=name, native_read=native, runs=len(runs),
+                spawns=max(spawns), spawns_min=min(spawns),
+                mean_ms=1000 * sum(times) / len(times),
+                min_ms=1000 * min(times), max_ms=1000 * max(times),
+                native_declined=sum(run[i][3] is None for run in runs),
+                differences=sorted(set(diffs))))
+    return summary
+
+
+def find_executable(name):
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        exe = os.path.join(path, name)
+        if os.path.isfile(exe) and os.access(exe, os.X_OK):
+            return exe
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check and benchmark the parted module on sparse images')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='runs of the step sequence per mode')
+    parser.add_argument('--size', type=int, default=256,
+                        help='image size in MiB')
+    parser.add_argument('--loop', action='store_true',
+                        help='attach images to loop devices (needs root)')
+    parser.add_argument('--parted', default=None,
+                        help='parted executable (default: from PATH)')
+    parser.add_argument('--mode', choices=['both', 'parted', 'native'],
+                        default='both', help='native_read setting(s) to run')
+    parser.add_argument('--json', action='store_true',
+                        help='print the summary as JSON')
+    args = parser.parse_args()
+
+    module = parted.module = BenchModule()
+
+    failures = check_functions()
+    for failure in failures:
+        print('FAIL %s' % failure, file=sys.stderr)
+
+    parted.parted_exec = args.parted or find_executable('parted')
+    if parted.parted_exec is None:
+        print('parted not found; only the function checks ran',
+              file=sys.stderr)
+        return 1 if failures else 0
+
+    modes = {'both': [False, True], 'parted': [False], 'native': [True]}
+    tmpdir = tempfile.mkdtemp(prefix='parted-bench.')
+    results = []
+    try:
+        for native in modes[args.mode]:
+            for run in range(args.runs):
+                image = os.path.join(tmpdir, 'disk%d-%d.img' % (native, run))
+                device = make_image(image, args.size << 20, args.loop)
+                try:
+                    results.append((native, run_sequence(module, device, native)))
+                finally:
+                    if device != image:
+                        subprocess.call(['losetup', '-d', device])
+                    os.unlink(image)
+    except (parted.PartedError, BenchError) as exc:
+        print('ERROR %s %s' % (exc, getattr(exc, 'kwargs', '')),
+              file=sys.stderr)
+        return 2
+    finally:
+        shutil.rmtree(tmpdir)
+
+    summary = summarize(results)
+    if args.json:
+        print(json.dumps(dict(failures=failures, steps=summary), indent=2))
+    else:
+        print('%-16s %-6s %6s %8s %8s %8s  %s' % (
+            'step', 'native', 'spawns', 'mean ms', 'min ms', 'max ms',
+            'differences'))
+        for s in summary:
+            spawns = str(s['spawns']) if s['spawns'] == s['spawns_min'] \
+                else '%d-%d' % (s['spawns_min'], s['spawns'])
+            print('%-16s %-6s %6s %8.1f %8.1f %8.1f  %s' % (
+                s['step'], 'yes' if s['native_read'] else 'no', spawns,
+                s['mean_ms'], s['min_ms'], s['max_ms'],
+                '; '.join(s['differences']) or
+                ('(not read natively)' if s['native_declined'] else '')))
+        print('total spawns: %d parted, %d native' % tuple(
+            sum(s['spawns'] * s['runs'] for s in summary
+                if s['native_read'] == native) for native in (False, True)))
+
+    differences = any(s['differences'] for s in summary)
+    return 1 if failures or differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,62 @@
 __metaclass__ = type
 
+import binascii
+import re
+from collections import OrderedDict
+
+from ansible.errors import AnsibleFilterError
+
+import hostmap
+import ldap_dn
+
+# systemd_escape translation table:  pass alphanumerics and underscore
+# unchanged, convert '/' to dash, and escape everything else C-style
+_escape_table = dict((i, u'\\x%02x' % i) for i in range(128)
+                     if not (chr(i).isalnum() or chr(i) == '_'))
+_escape_table[ord('/')] = u'-'
+
+# Non-ASCII characters are escaped byte by byte, like systemd does
+_non_ascii_re = re.compile(u'[^\x00-\x7f]+')
+_unescape_re = re.compile(r'\\x([0-9a-fA-F]{2})|-')
+
+# Memoized results, evicting the least recently used
+_escape_cache = OrderedDict()
+_escape_cache_size = 1024
+
+
+def _escape_non_ascii(m):
+    return u''.join(u'\\x%02x' % b for b in bytearray(m.group().encode('utf-8')))
+
+
+def _systemd_escape(data):
+    try:
+        res = _escape_cache.pop(data)
+    except KeyError:
+        # Throw away initial slash
+        path = data[1:] if data.startswith('/') else data
+        res = _non_ascii_re.sub(
+            _escape_non_ascii, (u'%s' % path).translate(_escape_table))
+        if len(_escape_cache) >= _escape_cache_size:
+            _escape_cache.popitem(last=False)
+    _escape_cache[data] = res
+    return res
+
+
+def _systemd_unescape(data, path=True):
+    res = bytearray()
+    pos = 0
+    for m in _unescape_re.finditer(data):
+        res.extend(data[pos:m.start()].encode('utf-8'))
+        if m.group(1) is None:
+            res.extend(b'/')
+        else:
+            res.extend(binascii.unhexlify(m.group(1).encode('ascii')))
+        pos = m.end()
+    res.extend(data[pos:].encode('utf-8'))
+    res = res.decode('utf-8')
+    return u'/' + res if path else res
+
+
 class FilterModule(object):
     ''' Query filter '''
 
@@ -15,45 +72,61 @@ class FilterModule(object):
         """Convert a path into a string suitable for a systemd unit name,
         similar to the `systemd-escape(1)` command
 
+        Given a list of paths, return a list of escaped strings.
+
         See https://www.freedesktop.org/software/systemd/man/systemd.unit.html
         """
-        res = ''
-        for i,c in enumerate(data):
-            if i==0 and c=='/':
-                # Throw away initial slashes
-                continue
-            elif (c=='.' and res==''):
-                # Escape initial '.' C-style
-                res += '\\x2e'
-            elif (c>='a' and c<='z') or (c>='A' and c<='Z') \
-                 or (c>='0' and c<='9') or (c=='_'):
-                # Pass alphanumerics and underscore unchanged
-                res += c
-            elif c=='/':
-                # Convert to dash
-                res += '-'
-            else:
-                # Escape everything else C-style
-                res += '\\' + hex(ord(c))[1:]
-        return res
+        if isinstance(data, (list, tuple)):
+            return [_systemd_escape(d) for d in data]
+        return _systemd_escape(data)
+
+    def systemd_unescape(self, data, path=True):
+        """Reverse `systemd_escape`; with `path`, restore the leading
+        slash thrown away by escaping
+
+        Given a list of strings, return a list of unescaped strings.
+        """
+        if isinstance(data, (list, tuple)):
+            return [_systemd_unescape(d, path) for d in data]
+        return _systemd_unescape(data, path)
 
     def domain_to_dn(self, data):
         """Given a domain name, return the ldap DN,
         e.g. example.com|domain_to_dn returns dc=example,dc=com
         """
-        return ','.join(map('dc={}'.format, data.split('.')))
+        return ldap_dn.domain_to_dn(data)
 
     def ip_addr_list(self, host_list, hostvars):
         """Given a list of hosts and hostvars, return a list of IP
-        addresses"""
-        return [ hostvars[h]['ansible_default_ipv4']['address']
-                 for h in host_list ]
+        addresses
+
+        Addresses come from the `do_droplet_facts` fact set by
+        `do_droplet_info` when it is for the host's current droplet,
+        else from the `ip_addr` fact or gathered facts.
+        `hostvars` may instead be a `host_address_map` result.
+        """
+        addrs = hostmap.build(hostvars, host_list)['hosts']
+        res = []
+        for h in host_list:
+            if not addrs.get(h, {}).get('ipv4', None):
+                raise AnsibleFilterError(
+                    "ip_addr_list: no IPv4 address known for host '%s'" % h)
+            res.append(addrs[h]['ipv4'])
+        return res
+
+    def host_address_map(self, hostvars, host_list=None):
+        """Given hostvars, return a map of host names to IPv4 and IPv6
+        addresses, IPA IP address and groups; see `lib/python/hostmap.py`
+        """
+        return hostmap.build(hostvars, host_list)
 
     def filters(self):
         return {
             'formatmapstr': self.formatmapstr,
             'formatmaplist': self.formatmaplist,
             'systemd_escape': self.systemd_escape,
+            'systemd_unescape': self.systemd_unescape,
             'domain_to_dn': self.domain_to_dn,
             'ip_addr_list': self.ip_addr_list,
+            'host_address_map': self.host_address_map,
         }
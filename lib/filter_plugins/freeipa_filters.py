@@ -1,21 +1,32 @@
 s__metaclass__ = type
 
+import hostmap
+
 class FilterModule(object):
     ''' Query filter '''
 
     def freeipa_dns_server_ips(self, hostvars):
-        """Given hostvars, extract DNS server IPs"""
+        """Given hostvars or a `host_address_map` result, extract DNS
+        server IPs"""
         # This was implemented as a variable 'freeipa_dns_servers' in
         # group_vars/freeipa_all.yaml after Ansible upgrade error saying
         # hostvars undefined; see that file for old implementation
-        if len(hostvars.keys()) == 0: return []
-        random_host = hostvars.keys()[0]
-        dns_server_list = hostvars[random_host].get('groups',{})\
-                                               .get('freeipa_servers',None)
+        if not hostmap.is_map(hostvars):
+            if len(hostvars.keys()) == 0: return []
+            # Read `groups` from any host, then only look at servers
+            some_host = next(iter(hostvars))
+            groups = hostmap.build(hostvars, [some_host])['groups']
+            servers = groups.get('freeipa_servers', None)
+            if not isinstance(servers, list): return
+            hostvars = hostmap.build(
+                hostvars, [s for s in servers if s in hostvars])
+        dns_server_list = hostvars['groups'].get('freeipa_servers', None)
         if not isinstance(dns_server_list, list): return
-        dns_server_ips = [ hostvars[s]['ipa_ip_addr']
+        hosts = hostvars['hosts']
+        dns_server_ips = [ hosts[s]['ipa_ip_addr']
                            for s in dns_server_list
-                           if 'ipa_ip_addr' in hostvars[s] ]
+                           if hosts.get(s, {}).get('ipa_ip_addr', None)
+                           is not None ]
         return dns_server_ips
 
 
@@ -1,27 +1,85 @@
 __metaclass__ = type
 
+import base64
+import binascii
+import hashlib
 import re
 
+from ansible.errors import AnsibleFilterError
+
+import ldap_dn
+
 class FilterModule(object):
     ''' Query filter '''
 
-    def ipa_cert_to_pem(self, data):
+    def ipa_cert_to_pem(self, data, validate=False, dedupe=False):
         """Given a base64-encoded cert string from IPA, create a
-        .pem-formatted cert"""
-        cert = '-----BEGIN CERTIFICATE-----\n'
-        while len(data) >= 64:
-            cert += ('%s\n' % data[:64])
-            data = data[64:]
-        cert += ('%s-----END CERTIFICATE-----\n' %
-                 ('%s\n' % data if data else ''))
-        return cert
-
-    cn_re = re.compile(r'CN=([^,]*),')
+        .pem-formatted cert
+
+        Given a list of cert strings, create a concatenated .pem
+        bundle.  With `validate`, fail on data that isn't base64 or
+        doesn't look like a DER-encoded cert; with `dedupe`, drop
+        repeated certs, compared by SHA-256 fingerprint.
+        """
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+
+        seen = set()
+        res = []
+        for cert in data:
+            # Strip whitespace, e.g. from line-wrapped input
+            cert = ''.join(cert.split())
+            if validate or dedupe:
+                der = self._cert_der(cert)
+                if dedupe:
+                    fingerprint = hashlib.sha256(der).digest()
+                    if fingerprint in seen:
+                        continue
+                    seen.add(fingerprint)
+            res.append('-----BEGIN CERTIFICATE-----\n')
+            res.extend('%s\n' % cert[i:i + 64]
+                       for i in range(0, len(cert), 64))
+            res.append('-----END CERTIFICATE-----\n')
+        return ''.join(res)
+
+    b64_re = re.compile(r'^[A-Za-z0-9+/]*={0,2}$')
+    def _cert_der(self, cert):
+        """Decode and sanity-check a base64-encoded DER cert"""
+        if len(cert) % 4 or not self.b64_re.match(cert):
+            raise AnsibleFilterError(
+                'ipa_cert_to_pem: invalid base64 cert data')
+        try:
+            der = base64.b64decode(cert.encode('ascii'))
+        except (TypeError, ValueError, binascii.Error):
+            raise AnsibleFilterError(
+                'ipa_cert_to_pem: invalid base64 cert data')
+        # A DER cert is an ASN.1 SEQUENCE whose length covers the rest
+        # of the data
+        if len(der) < 4 or der[0:1] != b'\x30':
+            raise AnsibleFilterError(
+                'ipa_cert_to_pem: data is not a DER-encoded cert')
+        length = ord(der[1:2])
+        offset = 2
+        if length & 0x80:
+            nbytes = length & 0x7f
+            if not 0 < nbytes <= 4:
+                raise AnsibleFilterError(
+                    'ipa_cert_to_pem: data is not a DER-encoded cert')
+            length = int(binascii.hexlify(der[2:2 + nbytes]), 16)
+            offset += nbytes
+        if offset + length != len(der):
+            raise AnsibleFilterError(
+                'ipa_cert_to_pem: DER cert length mismatch')
+        return der
+
     def cn_from_dn(self, data):
-        """Given a DN, extract and return the CN"""
-        m = self.cn_re.search(data)
-        if m is None:  return None
-        return m.group(1)
+        """Given a DN, extract and return the CN, or None
+
+        Given a list of DNs, return a list of CNs.
+        """
+        if isinstance(data, (list, tuple)):
+            return ldap_dn.get_attr_many(data, 'CN')
+        return ldap_dn.get_attr(data, 'CN')
 
     def filters(self):
         return {
@@ -0,0 +1,2 @@
+# This file must exist so that the action_plugin of the same name
+# works
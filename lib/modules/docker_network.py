@@ -22,11 +22,21 @@ description:
 options:
   name:
     description:
-      - Name of the network to operate on.
-    required: true
+      - Name of the network to operate on.  Either C(name) or C(networks)
+        is required.
     aliases:
       - network_name
 
+  networks:
+    description:
+      - List of networks to operate on, each a dict of the options of this
+        module from C(name) to C(ipv6), with the module options as
+        defaults.  Item values are checked and converted like the module
+        options, so e.g. C(connected) may be a comma separated string.
+        Networks are listed once for the whole list, and the networks are
+        managed in order.
+    default: null
+
   connected:
     description:
       - List of container names or container IDs to connect to a network.
@@ -49,11 +59,24 @@ options:
       - With state I(absent) forces disconnecting all containers from the
         network prior to deleting the network. With state I(present) will
         disconnect all containers, delete the network and re-create the
-        network.  This option is required if you have changed the IPAM or
-        driver options and want an existing network to be updated to use the
-        new options.
+        network, even if its configuration is unchanged.
     default: false
 
+  recreate:
+    description:
+      - The docker daemon can't change the driver, driver options, IPAM or
+        IPv6 settings of an existing network.  With C(changed), a network
+        whose settings differ is re-created:  all its containers are
+        disconnected together, the network is removed and created again,
+        and the containers are connected to it again, C(workers) at a
+        time.  With C(never), the
+        differences are only reported in C(disruption) and a warning, and
+        the existing network is kept.
+    default: changed
+    choices:
+      - changed
+      - never
+
   appends:
     description:
       - By default the connected list is canonical, meaning containers not on the list are removed from the network.
@@ -69,7 +92,18 @@ options:
 
   ipam_options:
     description:
-      - Dictionary of IPAM options.
+      - Dictionary of IPAM options for a single address pool.
+    default: null
+
+  ipam_config:
+    description:
+      - List of IPAM address pools, each a dictionary like C(ipam_options)
+        with C(subnet), C(iprange), C(gateway) and C(aux_addresses) keys,
+        e.g. an IPv4 and an IPv6 pool.  Existing pools are matched to these
+        by subnet, so their order doesn't matter, and a pool without a
+        subnet to a remaining one in the address family of its gateway or
+        iprange; an existing pool is only a difference if it isn't matched
+        and a pool of the same address family is listed.
     default: null
 
   ipv6:
@@ -77,6 +111,32 @@ options:
       - Whether IPV6 should be enabled on network
     default: false
 
+  workers:
+    description:
+      - Maximum number of containers connected to or disconnected from the
+        network concurrently.
+    default: 8
+
+  agent:
+    description:
+      - Send docker API calls through an agent process on the managed host,
+        which keeps its docker client, and its TLS connection, open across
+        tasks.  The agent is started by the first task needing it, serves
+        the tasks using the same docker connection options, and exits once
+        unused for C(agent_timeout) seconds.  Its socket is kept in
+        C(~/.ansible/docker_network), readable by the remote user only, and
+        named after the connection options and the modification times of
+        the TLS files, so that renewed certificates start a new agent.  If
+        the agent can't be started, the module connects to the daemon
+        directly.  In check mode, a running agent is used but none is
+        started.
+    default: false
+
+  agent_timeout:
+    description:
+      - Seconds the agent keeps running without any API calls.
+    default: 600
+
   state:
     description:
       - I(absent) deletes the network. If a network has connected containers, it
@@ -148,6 +208,30 @@ EXAMPLES = '''
       subnet: fdc3:4282:f579:d5d0::/64
     ipv6: true
 
+- name: Manage several networks in one task
+  docker_network:
+    driver_options:
+      com.docker.network.driver.mtu: 1450
+    networks:
+      - name: network_one
+        connected:
+          - container_a
+      - name: network_two
+        ipam_options:
+          subnet: '172.3.27.0/24'
+      - name: network_old
+        state: absent
+        force: yes
+
+- name: Create a dual-stack network
+  docker_network:
+    name: network_four
+    ipam_config:
+      - subnet: '172.3.28.0/24'
+        gateway: 172.3.28.1
+      - subnet: fdc3:4282:f579:d5d1::/64
+    ipv6: true
+
 - name: Delete a network, disconnecting all containers
   docker_network:
     name: network_one
@@ -161,9 +245,72 @@ facts:
     returned: success
     type: dict
     sample: {}
+disruption:
+    description:
+      - The changes predicted before applying them.  C(immutable) lists the
+        settings that differ and need the network re-created, C(mutable) the
+        containers to connect and disconnect, and C(reconnected) the
+        containers disconnected and connected again if the network is
+        re-created.
+    returned: state is present
+    type: dict
+    sample:
+      recreate: true
+      immutable: [ 'driver_options.com.docker.network.driver.mtu' ]
+      mutable: [ 'connect.web3' ]
+      reconnected: [ 'web1', 'web2', 'web3' ]
+api_stats:
+    description:
+      - The number of docker API calls and the time they took in seconds,
+        in total and for each client method; C(client) is the time taken to
+        set up the docker client or connect to the agent.
+    returned: success
+    type: dict
+    sample:
+      agent: false
+      calls: 3
+      elapsed: 0.214
+      per_method:
+        client: { calls: 1, elapsed: 0.151, max: 0.151 }
+        networks: { calls: 1, elapsed: 0.031, max: 0.031 }
+        inspect_network: { calls: 1, elapsed: 0.032, max: 0.032 }
+networks:
+    description: The results for each network, with C(networks)
+    returned: success
+    type: list
+    sample:
+      - name: network_one
+        changed: true
+        disruption: {}
+docker_networks:
+    description: Network inspection results for the C(networks) networks
+                 present, by name, in C(ansible_facts)
+    returned: success
+    type: dict
+    sample: {}
 '''
 
-from ansible.module_utils.docker_common import AnsibleDockerClient, DockerBaseClass, HAS_DOCKER_PY_2, HAS_DOCKER_PY_3
+import fcntl
+import hashlib
+import json
+import os
+import select
+import socket
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from ansible.module_utils.basic import AnsibleModule, _load_params
+from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.docker_common import AnsibleDockerClient, DockerBaseClass, DOCKER_COMMON_ARGS, HAS_DOCKER_PY_2, HAS_DOCKER_PY_3
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import string_types
 
 try:
     from docker import utils
@@ -174,8 +321,381 @@ except:
     pass
 
 
+# Docker client methods timed by `TimedClient` and forwarded to the agent
+api_methods = ['networks', 'inspect_network', 'create_network', 'remove_network',
+               'connect_container_to_network', 'disconnect_container_from_network']
+
+
+class AgentError(Exception):
+    pass
+
+
+class TimedClient(object):
+    '''
+    Proxy for a docker client or `AgentClient` recording the time taken by
+    each API call in `self.calls`; see `stats()`.
+    '''
+
+    def __init__(self, client, setup_time, agent=False):
+        self.client = client
+        self.agent = agent
+        self.calls = [('client', setup_time)]
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in api_methods:
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.time()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.calls.append((name, time.time() - start))
+        return call
+
+    def stats(self):
+        per_method = {}
+        for name, elapsed in self.calls:
+            m = per_method.setdefault(name, dict(calls=0, elapsed=0.0, max=0.0))
+            m['calls'] += 1
+            m['elapsed'] += elapsed
+            m['max'] = max(m['max'], elapsed)
+        for m in per_method.values():
+            m['elapsed'] = round(m['elapsed'], 3)
+            m['max'] = round(m['max'], 3)
+        api_calls = [c for c in self.calls if c[0] != 'client']
+        return dict(
+            agent=self.agent,
+            calls=len(api_calls),
+            elapsed=round(sum(elapsed for name, elapsed in api_calls), 3),
+            per_method=per_method,
+        )
+
+
+class AgentClient(object):
+    '''
+    Docker client stand-in forwarding API calls to the agent listening on
+    `path`, one connection per call so that calls may run concurrently.
+    '''
+
+    def __init__(self, module, path):
+        self.module = module
+        self.check_mode = module.check_mode
+        self.path = path
+        self.timeout = (module.params.get('timeout') or 60) + 10
+
+    def fail(self, msg):
+        self.module.fail_json(msg=msg)
+
+    def call(self, method, *args, **kwargs):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            sock.sendall(to_bytes(json.dumps(dict(method=method, args=args, kwargs=kwargs)) + '\n'))
+            line = sock.makefile('rb').readline()
+        finally:
+            sock.close()
+        try:
+            response = json.loads(to_text(line))
+        except ValueError:
+            raise AgentError("No response from docker_network agent %s" % self.path)
+        if 'error' in response:
+            raise AgentError(response['error'])
+        return response['result']
+
+    def __getattr__(self, name):
+        if name not in api_methods:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.last_used = time.time()
+        try:
+            request = json.loads(to_text(self.rfile.readline()))
+            if request['method'] == 'ping':
+                response = dict(result=os.getpid())
+            elif request['method'] in api_methods:
+                method = getattr(self.server.client, request['method'])
+                response = dict(result=method(*request['args'], **request['kwargs']))
+            else:
+                raise AgentError("Unknown method %s" % request['method'])
+        except Exception as exc:
+            response = dict(error=to_native(exc))
+        self.wfile.write(to_bytes(json.dumps(response) + '\n'))
+        self.server.last_used = time.time()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+# TLS files whose contents, unlike their paths, aren't in the connection
+# options; their modification times go in the agent socket name
+agent_cert_files = ['cacert_path', 'cert_path', 'key_path']
+
+
+def agent_path(params):
+    '''
+    Returns the agent socket path for the docker connection options, named
+    after a hash of them so that each daemon and set of credentials has its
+    own agent.  The hash includes the modification times of the TLS files,
+    so that renewed certificates start a new agent, leaving the old one to
+    exit when idle.
+    '''
+    key = dict((k, params.get(k)) for k in DOCKER_COMMON_ARGS)
+    for k in agent_cert_files:
+        if params.get(k):
+            try:
+                key[k + '_mtime'] = os.stat(params[k]).st_mtime
+            except OSError:
+                pass
+    key = json.dumps(key, sort_keys=True, default=str)
+    return os.path.join(os.path.expanduser('~/.ansible/docker_network'),
+                        'agent-%s.sock' % hashlib.sha1(to_bytes(key)).hexdigest()[:16])
+
+
+def run_agent(path, make_client, idle_timeout, status):
+    '''
+    Serves docker API calls on the unix socket `path` until idle for
+    `idle_timeout` seconds.  Whether the agent is ready is written to the
+    `status` pipe: C({"ready": pid}) once listening, else the error.
+    '''
+    stdout = os.dup(1)
+    try:
+        # `fail_json()` output from setting up the client goes to the task
+        os.dup2(status, 1)
+        try:
+            client = make_client()
+            os.umask(0o077)
+            server = AgentServer(path, AgentHandler)
+        except Exception as exc:
+            os.write(status, to_bytes(json.dumps(dict(failed=True, msg=to_native(exc)))))
+            raise
+        finally:
+            sys.stdout.flush()
+            os.dup2(stdout, 1)
+        # Only remove the socket at exit if it's still this agent's, not
+        # that of an agent started after this one stopped answering
+        bound = os.stat(path)
+        os.write(status, to_bytes(json.dumps(dict(ready=os.getpid()))))
+    finally:
+        os.close(status)
+        os.close(stdout)
+    server.client = client
+    server.last_used = time.time()
+    server.timeout = min(idle_timeout, 5)
+    try:
+        while time.time() - server.last_used < idle_timeout:
+            server.handle_request()
+    finally:
+        server.server_close()
+        try:
+            current = os.stat(path)
+            if (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+def start_agent(path, make_client, idle_timeout, timeout):
+    '''
+    Starts `run_agent()` in a daemon process, detached from the task so that
+    the task can finish while the agent keeps running, and waits up to
+    `timeout` seconds for it to listen.  Raises `AgentError` if it doesn't.
+    '''
+    status_r, status_w = os.pipe()
+    pid = os.fork()
+    if not pid:
+        try:
+            os.close(status_r)
+            os.setsid()
+            if os.fork():
+                os._exit(0)
+            os.chdir('/')
+            null = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(null, fd)
+            run_agent(path, make_client, idle_timeout, status_w)
+        finally:
+            os._exit(0)
+
+    os.close(status_w)
+    os.waitpid(pid, 0)
+    data = b''
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline:
+            if not select.select([status_r], [], [], max(0, deadline - time.time()))[0]:
+                continue
+            chunk = os.read(status_r, 65536)
+            if not chunk:
+                break
+            data += chunk
+        else:
+            raise AgentError("Timed out waiting for the agent to start")
+    finally:
+        os.close(status_r)
+    try:
+        status = json.loads(to_text(data))
+    except ValueError:
+        status = dict(msg=to_text(data).strip() or "The agent exited while starting")
+    if 'ready' not in status:
+        raise AgentError(status.get('msg'))
+
+
+def connect_agent(module, make_client):
+    '''
+    Returns an `AgentClient` for the task's docker connection, starting the
+    agent if it isn't running.  In check mode, returns None rather than
+    start one.  Raises `AgentError` if the agent can't be started.
+    '''
+    path = agent_path(module.params)
+    client = AgentClient(module, path)
+    try:
+        client.call('ping')
+        return client
+    except (socket.error, AgentError):
+        pass
+    if module.check_mode:
+        return None
+
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path), 0o700)
+    # One task at a time starts the agent; the others wait, then use it
+    lock = os.open(path[:-len('.sock')] + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            client.call('ping')
+            return client
+        except (socket.error, AgentError):
+            pass
+        if os.path.exists(path):
+            # Left behind by an agent that died
+            os.unlink(path)
+        start_agent(path, make_client, module.params['agent_timeout'],
+                    module.params.get('timeout') or 60)
+        return client
+    finally:
+        os.close(lock)
+
+
+# Network settings, as named in `has_different_config()` differences, that
+# the daemon has no API to change; only container membership is mutable
+immutable_settings = ['driver', 'driver_options', 'ipam_driver', 'ipam_config', 'ipv6']
+
+# IPAM pool option names, lowercase, as the daemon returns them, and as
+# docker-py takes them when different
+ipam_daemon_keys = {'ip_range': 'iprange', 'aux_addresses': 'auxiliaryaddresses'}
+ipam_pool_kwargs = {'ip_range': 'iprange', 'auxiliaryaddresses': 'aux_addresses'}
+
+
+def pool_key_map(pool):
+    """Return an IPAM pool's options keyed by lowercase daemon name."""
+    return dict((ipam_daemon_keys.get(k.lower(), k.lower()), v) for k, v in pool.items())
+
+
+def normalize_subnet(subnet):
+    """Return a subnet in canonical form, so that different notations of the
+    same IPv6 subnet compare equal."""
+    try:
+        addr, prefix = subnet.split('/')
+        family = socket.AF_INET6 if ':' in addr else socket.AF_INET
+        return '%s/%d' % (socket.inet_ntop(family, socket.inet_pton(family, addr)), int(prefix))
+    except (AttributeError, ValueError, socket.error):
+        return subnet
+
+
+def pool_family(pool):
+    """Return whether an IPAM pool, keyed as by `pool_key_map()`, is IPv6 by
+    its subnet, gateway or iprange, or None if it has none of them."""
+    for key in ('subnet', 'gateway', 'iprange'):
+        if pool.get(key):
+            return ':' in pool[key]
+    return None
+
+
+def option_value(value):
+    """Convert an option value to the string the daemon stores for it."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+# Keys allowed in `networks` items, and their aliases
+network_keys = ['network_name', 'connected', 'state', 'driver', 'driver_options',
+                'force', 'recreate', 'appends', 'ipam_driver',
+                'ipam_options', 'ipam_config', 'ipv6']
+network_aliases = {'name': 'network_name', 'containers': 'connected',
+                   'incremental': 'appends'}
+
+
+def item_list(value):
+    """Convert a list option given as a comma separated string, as Ansible does."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, string_types):
+        return [v.strip() for v in value.split(',')]
+    if isinstance(value, (int, float)):
+        return [str(value)]
+    raise TypeError('%s cannot be converted to a list' % (type(value).__name__,))
+
+
+def item_dict(value):
+    if isinstance(value, dict):
+        return value
+    raise TypeError('%s cannot be converted to a dict' % (type(value).__name__,))
+
+
+# Conversions of `networks` item values, by argument_spec type
+item_types = {
+    'str': to_native,
+    'bool': lambda value: boolean(value, strict=True),
+    'int': int,
+    'list': item_list,
+    'dict': item_dict,
+}
+
+
+def network_params(client, item, argument_spec):
+    """Return the module parameters for one item of `networks`, with its
+    values checked and converted like those of the module options."""
+    params = dict(client.module.params, networks=None)
+    if not isinstance(item, dict):
+        client.fail("Each 'networks' item must be a dict: %s" % (item,))
+    for key, value in item.items():
+        key = network_aliases.get(key, key)
+        if key not in network_keys:
+            client.fail("Unknown key '%s' in 'networks' item: %s" % (key, item))
+        # Like an option set to null, a null value keeps the default
+        if value is None:
+            continue
+        spec = argument_spec[key]
+        try:
+            value = item_types[spec['type']](value)
+        except (TypeError, ValueError) as exc:
+            client.fail("Bad %s '%s' in 'networks' item, must be of type %s: %s"
+                        % (key, value, spec['type'], exc))
+        if 'choices' in spec and value not in spec['choices']:
+            client.fail("Bad %s '%s' in 'networks' item, must be one of: %s"
+                        % (key, value, ', '.join(spec['choices'])))
+        params[key] = value
+    if not params['network_name']:
+        client.fail("Each 'networks' item needs a name: %s" % (item,))
+    if params['state'] not in ('present', 'absent'):
+        client.fail("Bad state '%s' in 'networks' item" % (params['state'],))
+    params['connected'] = list(params['connected'] or [])
+    return params
+
+
 class TaskParameters(DockerBaseClass):
-    def __init__(self, client):
+    def __init__(self, client, params=None):
         super(TaskParameters, self).__init__()
         self.client = client
 
@@ -185,24 +705,35 @@ class TaskParameters(DockerBaseClass):
         self.driver_options = None
         self.ipam_driver = None
         self.ipam_options = None
+        self.ipam_config = None
         self.ipv6 = None
         self.appends = None
         self.force = None
+        self.recreate = None
+        self.workers = None
         self.debug = None
 
-        for key, value in client.module.params.items():
+        if params is None:
+            params = client.module.params
+        for key, value in params.items():
             setattr(self, key, value)
 
 
-def container_names_in_network(network):
-    return [c['Name'] for c in network['Containers'].values()] if network['Containers'] else []
+def network_containers(network):
+    """Return a dict of container ID to name for an inspected network."""
+    if not network or not network.get('Containers'):
+        return {}
+    return dict((cid, c['Name']) for cid, c in network['Containers'].items())
 
 
 class DockerNetworkManager(object):
 
-    def __init__(self, client):
+    def __init__(self, client, params=None, snapshot=None):
         self.client = client
-        self.parameters = TaskParameters(client)
+        self.parameters = TaskParameters(client, params)
+        # Networks listed once for all `networks` items; None to query the
+        # daemon for this network only
+        self.snapshot = snapshot
         self.check_mode = self.client.check_mode
         self.results = {
             u'changed': False,
@@ -210,10 +741,15 @@ class DockerNetworkManager(object):
         }
         self.diff = self.client.module._diff
 
-        self.existing_network = self.get_existing_network()
+        self.existing_network = self.initial_network = self.get_existing_network()
+
+        # Containers in the network, and their names and IDs for membership
+        # tests; kept up to date as containers are connected and disconnected
+        self.containers = network_containers(self.existing_network)
+        self.members = set(self.containers) | set(self.containers.values())
 
         if not self.parameters.connected and self.existing_network:
-            self.parameters.connected = container_names_in_network(self.existing_network)
+            self.parameters.connected = list(self.containers.values())
 
         state = self.parameters.state
         if state == 'present':
@@ -222,14 +758,21 @@ class DockerNetworkManager(object):
             self.absent()
 
     def get_existing_network(self):
-        networks = self.client.networks(names=[self.parameters.network_name])
-        # check if a user is trying to find network by its Id
-        if not networks:
-            networks = self.client.networks(ids=[self.parameters.network_name])
+        name = self.parameters.network_name
+        if self.snapshot is not None:
+            networks = [n for n in self.snapshot if n['Name'] == name]
+            if not networks:
+                networks = [n for n in self.snapshot if n['Id'].startswith(name)]
+        else:
+            networks = self.client.networks(names=[name])
+            # check if a user is trying to find network by its Id
+            if not networks:
+                networks = self.client.networks(ids=[name])
         if not networks:
             return None
-        else:
-            return networks[0]
+        # Listing networks doesn't return their containers with API versions
+        # 1.28 and up; inspect the network once for them
+        return self.client.inspect_network(networks[0]['Id'])
 
     def has_different_config(self, net):
         '''
@@ -250,45 +793,96 @@ class DockerNetworkManager(object):
                 differences.append('driver_options')
             else:
                 for key, value in self.parameters.driver_options.items():
-                    if not (key in net['Options']) or value != net['Options'][key]:
+                    if not (key in net['Options']) or option_value(value) != net['Options'][key]:
                         different = True
                         differences.append('driver_options.%s' % key)
         if self.parameters.ipam_driver:
             if not net.get('IPAM') or net['IPAM']['Driver'] != self.parameters.ipam_driver:
                 different = True
                 differences.append('ipam_driver')
-        if self.parameters.ipam_options:
-            if not net.get('IPAM') or not net['IPAM'].get('Config'):
-                different = True
-                differences.append('ipam_options')
-            else:
-                for key, value in self.parameters.ipam_options.items():
-                    camelkey = None
-                    for net_key in net['IPAM']['Config'][0]:
-                        if key == net_key.lower():
-                            camelkey = net_key
-                            break
-                    if not camelkey:
-                        # key not found
-                        different = True
-                        differences.append('ipam_options.%s' % key)
-                    elif net['IPAM']['Config'][0].get(camelkey) != value:
-                        # key has different value
-                        different = True
-                        differences.append('ipam_options.%s' % key)
+        ipam_differences = self.ipam_differences(net)
+        if ipam_differences:
+            different = True
+            differences.extend(ipam_differences)
         if self.parameters.ipv6 and self.parameters.ipv6 != net['EnableIPv6']:
             different = True
             differences.append('ipv6')
         return different, differences
 
+    def ipam_pools(self):
+        '''
+        Returns the IPAM pools of `ipam_config`, or the `ipam_options` pool.
+        '''
+        if self.parameters.ipam_config:
+            for pool in self.parameters.ipam_config:
+                if not isinstance(pool, dict):
+                    self.client.fail("Each 'ipam_config' item must be a dict: %s" % (pool,))
+            return self.parameters.ipam_config
+        if self.parameters.ipam_options:
+            return [self.parameters.ipam_options]
+        return []
+
+    def ipam_differences(self, net):
+        '''
+        Compares the IPAM pools with those of an existing network, matching
+        them by subnet; a pool without a subnet is matched to the first
+        existing pool not otherwise matched, in the address family of its
+        gateway or iprange if it has one.  Returns the list of differences.
+        '''
+        pools = [pool_key_map(pool) for pool in self.ipam_pools()]
+        if not pools:
+            return []
+        existing = [pool_key_map(pool) for pool in (net.get('IPAM') or {}).get('Config') or []]
+        by_subnet = dict((normalize_subnet(pool['subnet']), i)
+                         for i, pool in enumerate(existing) if pool.get('subnet'))
+        matches = [by_subnet.get(normalize_subnet(pool['subnet'])) if pool.get('subnet') else None
+                   for pool in pools]
+        matched = set(i for i in matches if i is not None)
+        for i, pool in enumerate(pools):
+            if pool.get('subnet'):
+                continue
+            family = pool_family(pool)
+            for j, current in enumerate(existing):
+                if j not in matched and family in (None, pool_family(current)):
+                    matches[i] = j
+                    matched.add(j)
+                    break
+
+        differences = []
+        for i, pool in enumerate(pools):
+            name = 'ipam_config.%s' % (pool.get('subnet') or i)
+            if matches[i] is None:
+                differences.append(name)
+                continue
+            current = existing[matches[i]]
+            for key, value in pool.items():
+                if key == 'subnet' or value is None:
+                    continue
+                if isinstance(value, dict):
+                    value = dict((k, option_value(v)) for k, v in value.items())
+                else:
+                    value = option_value(value)
+                if (current.get(key) or None) != (value or None):
+                    differences.append('%s.%s' % (name, key))
+
+        # Unmatched pools of the network, in an address family given, are
+        # differences
+        families = set(pool_family(pool) for pool in pools)
+        for subnet, j in sorted(by_subnet.items()):
+            if j not in matched and pool_family(existing[j]) in families:
+                differences.append('ipam_config.%s' % subnet)
+        return differences
+
     def create_network(self):
         if not self.existing_network:
             ipam_pools = []
-            if self.parameters.ipam_options:
+            for pool in self.ipam_pools():
+                kwargs = dict((ipam_pool_kwargs.get(k.lower(), k.lower()), v)
+                              for k, v in pool.items())
                 if HAS_DOCKER_PY_2 or HAS_DOCKER_PY_3:
-                    ipam_pools.append(IPAMPool(**self.parameters.ipam_options))
+                    ipam_pools.append(IPAMPool(**kwargs))
                 else:
-                    ipam_pools.append(utils.create_ipam_pool(**self.parameters.ipam_options))
+                    ipam_pools.append(utils.create_ipam_pool(**kwargs))
 
             if HAS_DOCKER_PY_2 or HAS_DOCKER_PY_3:
                 ipam_config = IPAMConfig(driver=self.parameters.ipam_driver,
@@ -298,13 +892,17 @@ class DockerNetworkManager(object):
                                                        pool_configs=ipam_pools)
 
             if not self.check_mode:
+                options = dict((k, option_value(v))
+                               for k, v in (self.parameters.driver_options or {}).items())
                 resp = self.client.create_network(self.parameters.network_name,
                                                   driver=self.parameters.driver,
-                                                  options=self.parameters.driver_options,
+                                                  options=options,
                                                   ipam=ipam_config,
                                                   enable_ipv6=self.parameters.ipv6)
 
                 self.existing_network = self.client.inspect_network(resp['Id'])
+                if self.snapshot is not None:
+                    self.snapshot.append(self.existing_network)
             self.results['actions'].append("Created network %s with driver %s" % (self.parameters.network_name, self.parameters.driver))
             self.results['changed'] = True
 
@@ -313,43 +911,98 @@ class DockerNetworkManager(object):
             self.disconnect_all_containers()
             if not self.check_mode:
                 self.client.remove_network(self.parameters.network_name)
+                if self.snapshot is not None:
+                    self.snapshot[:] = [n for n in self.snapshot
+                                        if n['Id'] != self.existing_network['Id']]
             self.results['actions'].append("Removed network %s" % (self.parameters.network_name,))
             self.results['changed'] = True
 
     def is_container_connected(self, container_name):
-        return container_name in container_names_in_network(self.existing_network)
+        return container_name in self.members
 
-    def connect_containers(self):
+    def call_containers(self, method, names):
+        '''
+        Calls a docker client method with each container name and the network
+        name, with at most `workers` calls in flight; fails the module listing
+        the containers whose calls raised.
+        '''
+        if self.check_mode or not names:
+            return
+
+        def call(name):
+            try:
+                method(name, self.parameters.network_name)
+            except Exception as exc:
+                return "%s: %s" % (name, exc)
+
+        pool = ThreadPool(max(1, min(self.parameters.workers, len(names))))
+        try:
+            errors = [e for e in pool.map(call, names) if e]
+        finally:
+            pool.close()
+            pool.join()
+        if errors:
+            self.client.fail("Error updating containers of network %s: %s"
+                             % (self.parameters.network_name, '; '.join(errors)))
+
+    def containers_to_connect(self):
+        names = []
         for name in self.parameters.connected:
-            if not self.is_container_connected(name):
-                if not self.check_mode:
-                    self.client.connect_container_to_network(name, self.parameters.network_name)
-                self.results['actions'].append("Connected container %s" % (name,))
-                self.results['changed'] = True
+            if not self.is_container_connected(name) and name not in names:
+                names.append(name)
+        return names
+
+    def containers_to_disconnect(self):
+        connected = set(self.parameters.connected)
+        return [cid for cid, name in self.containers.items()
+                if name not in connected and cid not in connected]
+
+    def connect_containers(self):
+        names = self.containers_to_connect()
+        self.call_containers(self.client.connect_container_to_network, names)
+        for name in names:
+            self.members.add(name)
+            self.results['actions'].append("Connected container %s" % (name,))
+            self.results['changed'] = True
 
     def disconnect_missing(self):
-        if not self.existing_network:
-            return
-        containers = self.existing_network['Containers']
-        if not containers:
-            return
-        for c in containers.values():
-            name = c['Name']
-            if name not in self.parameters.connected:
-                self.disconnect_container(name)
+        self.disconnect_containers(self.containers_to_disconnect())
 
     def disconnect_all_containers(self):
-        containers = self.client.inspect_network(self.parameters.network_name)['Containers']
-        if not containers:
-            return
-        for cont in containers.values():
-            self.disconnect_container(cont['Name'])
+        self.disconnect_containers(list(self.containers))
+
+    def disconnect_containers(self, ids):
+        names = [self.containers[cid] for cid in ids]
+        self.call_containers(self.client.disconnect_container_from_network, names)
+        for cid, name in zip(ids, names):
+            del self.containers[cid]
+            self.members.discard(cid)
+            self.members.discard(name)
+            self.results['actions'].append("Disconnected container %s" % (name,))
+            self.results['changed'] = True
 
-    def disconnect_container(self, container_name):
-        if not self.check_mode:
-            self.client.disconnect_container_from_network(container_name, self.parameters.network_name)
-        self.results['actions'].append("Disconnected container %s" % (container_name,))
-        self.results['changed'] = True
+    def predict_disruption(self, differences, recreate):
+        '''
+        Returns the changes `present()` is about to make: the differing
+        immutable settings, the mutable container membership changes and,
+        when re-creating the network, the containers it reconnects.
+        '''
+        if self.parameters.appends:
+            kept = list(self.containers.values())
+        else:
+            disconnected = set(self.containers_to_disconnect())
+            kept = [name for cid, name in self.containers.items()
+                    if cid not in disconnected]
+        mutable = ['connect.%s' % name for name in self.containers_to_connect()]
+        if not self.parameters.appends:
+            mutable.extend('disconnect.%s' % self.containers[cid]
+                           for cid in self.containers_to_disconnect())
+        return dict(
+            recreate=recreate,
+            immutable=[d for d in differences if d.split('.')[0] in immutable_settings],
+            mutable=mutable,
+            reconnected=sorted(kept) if recreate else [],
+        )
 
     def present(self):
         different = False
@@ -357,9 +1010,24 @@ class DockerNetworkManager(object):
         if self.existing_network:
             different, differences = self.has_different_config(self.existing_network)
 
-        if self.parameters.force or different:
+        recreate = self.parameters.force or (different and self.parameters.recreate != 'never')
+        disruption = self.predict_disruption(differences, recreate)
+        self.results['disruption'] = disruption
+        if different and not recreate:
+            self.client.module.warn(
+                "Network %s differs in %s; not re-created with recreate=never"
+                % (self.parameters.network_name, ', '.join(disruption['immutable'])))
+
+        if recreate:
+            # Containers staying in the network, including those kept by
+            # `appends`, are connected again to the new network
+            for name in disruption['reconnected']:
+                if name not in self.parameters.connected:
+                    self.parameters.connected.append(name)
             self.remove_network()
             self.existing_network = None
+            self.containers = {}
+            self.members = set()
 
         self.create_network()
         self.connect_containers()
@@ -372,7 +1040,16 @@ class DockerNetworkManager(object):
         if not self.check_mode and not self.parameters.debug:
             self.results.pop('actions')
 
-        self.results['ansible_facts'] = {u'docker_network': self.get_existing_network()}
+        self.results['ansible_facts'] = {u'docker_network': self.network_facts()}
+
+    def network_facts(self):
+        '''
+        Returns the inspection of the network; the network is only inspected
+        again if it was changed.
+        '''
+        if self.check_mode or not self.results['changed']:
+            return self.initial_network
+        return self.client.inspect_network(self.existing_network['Id'])
 
     def absent(self):
         self.remove_network()
@@ -380,26 +1057,77 @@ class DockerNetworkManager(object):
 
 def main():
     argument_spec = dict(
-        network_name=dict(type='str', required=True, aliases=['name']),
+        network_name=dict(type='str', aliases=['name']),
+        networks=dict(type='list', default=None),
         connected=dict(type='list', default=[], aliases=['containers']),
         state=dict(type='str', default='present', choices=['present', 'absent']),
         driver=dict(type='str', default='bridge'),
         driver_options=dict(type='dict', default={}),
         force=dict(type='bool', default=False),
+        recreate=dict(type='str', default='changed', choices=['changed', 'never']),
         appends=dict(type='bool', default=False, aliases=['incremental']),
         ipam_driver=dict(type='str', default=None),
         ipam_options=dict(type='dict', default={}),
+        ipam_config=dict(type='list', default=None),
         ipv6=dict(type='bool', default=False),
+        workers=dict(type='int', default=8),
+        agent=dict(type='bool', default=False),
+        agent_timeout=dict(type='int', default=600),
         debug=dict(type='bool', default=False)
     )
 
-    client = AnsibleDockerClient(
-        argument_spec=argument_spec,
-        supports_check_mode=True
-    )
-
-    cm = DockerNetworkManager(client)
-    client.module.exit_json(**cm.results)
+    def make_client():
+        return AnsibleDockerClient(
+            argument_spec=argument_spec,
+            supports_check_mode=True,
+            mutually_exclusive=[['network_name', 'networks'], ['ipam_options', 'ipam_config']]
+        )
+
+    # Look at the agent option before the docker client is set up, since
+    # that connects to the daemon.  The options are only parsed without the
+    # docker client when using the agent, which has the task's module.
+    start = time.time()
+    agent = None
+    warning = None
+    if boolean(_load_params().get('agent', False), strict=False):
+        module = AnsibleModule(
+            argument_spec=dict(DOCKER_COMMON_ARGS, **argument_spec),
+            supports_check_mode=True,
+            mutually_exclusive=[['network_name', 'networks'], ['ipam_options', 'ipam_config']]
+        )
+        try:
+            agent = connect_agent(module, make_client)
+        except (OSError, AgentError) as exc:
+            warning = ("Could not start the docker_network agent, connecting to the daemon directly: %s"
+                       % (to_native(exc),))
+    client = TimedClient(agent or make_client(), time.time() - start, agent=agent is not None)
+    if warning:
+        client.module.warn(warning)
+
+    if client.module.params['networks'] is None:
+        if not client.module.params['network_name']:
+            client.fail("one of the following is required: name, networks")
+        cm = DockerNetworkManager(client)
+        client.module.exit_json(api_stats=client.stats(), **cm.results)
+
+    # Check all items before changing anything, then list networks once
+    # and manage them in order against that list
+    items = [network_params(client, item, argument_spec) for item in client.module.params['networks']]
+    snapshot = client.networks()
+    results = []
+    facts = {}
+    for params in items:
+        cm = DockerNetworkManager(client, params, snapshot)
+        network_facts = cm.results.pop('ansible_facts', {}).get(u'docker_network')
+        if network_facts:
+            facts[network_facts['Name']] = network_facts
+        results.append(dict(cm.results, name=params['network_name']))
+
+    client.module.exit_json(
+        changed=any(r['changed'] for r in results),
+        networks=results,
+        api_stats=client.stats(),
+        ansible_facts={u'docker_networks': facts})
 
 
 if __name__ == '__main__':
@@ -102,8 +102,8 @@ cert:
 from ansible.module_utils.pycompat24 import get_exception
 #from ansible.module_utils.ipa import IPAClient
 from ipa import IPAClient
+import ldap_dn
 
-import re
 
 class CertIPAClient(IPAClient):
 
@@ -166,9 +166,16 @@ class CertIPAClient(IPAClient):
             revocation_reason = self.canon_params['revocation_reason'])
 
     def subject_to_principal(self, subject):
-        m = re.match(r'CN=([^,]*),O=', subject)
-        principal = subject if m is None else m.group(1)
-        return principal
+        # A subject DN like 'CN=principal,O=REALM' gives its CN; anything
+        # else is taken to be a principal already
+        try:
+            rdns = ldap_dn.parse(subject)
+        except ldap_dn.DNError:
+            return subject
+        if len(rdns) > 1 and rdns[0][0][0].upper() == 'CN' \
+           and rdns[1][0][0].upper() == 'O':
+            return rdns[0][0][1]
+        return subject
 
     def find_request_item(self):
         # cert_find uses 'subject' as key rather than 'principal'
@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+ANSIBLE_METADATA = {'metadata_version': '1.0',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+
+DOCUMENTATION = '''
+---
+module: openssl_cert_check
+short_description: Check certificates against their keys and CA chains
+description:
+    - "For each set of certificate, private key and CA bundle files, report
+       whether the certificate matches the key, whether it verifies against
+       the CA bundle, its validity dates and its subjectAltNames. All checks
+       run in-process with the pyOpenSSL python library, replacing
+       C(openssl x509 -modulus)/C(openssl verify) shell pipelines. This
+       module never changes anything."
+requirements:
+    - "python-pyOpenSSL >= 16.0"
+options:
+    certs:
+        required: false
+        description:
+            - List of dicts with C(cert) and optional C(key) and C(ca) paths
+    cert:
+        required: false
+        description:
+            - Path to a PEM certificate; a single-item shortcut for C(certs)
+    key:
+        required: false
+        description:
+            - Path to the PEM private key expected to match C(cert)
+    ca:
+        required: false
+        description:
+            - Path to a PEM CA bundle used to verify C(cert); every
+              certificate in the bundle is trusted, as with
+              C(openssl verify -CAfile)
+    fail:
+        required: false
+        default: False
+        choices: [ True, False ]
+        description:
+            - Fail if any certificate is missing, does not match its key,
+              does not verify or has expired
+'''
+
+EXAMPLES = '''
+# Check a client cert, and fail if anything is wrong
+- openssl_cert_check:
+    cert: /etc/ssl/client/cert.pem
+    key: /etc/ssl/client/key.pem
+    ca: /etc/ssl/client/ca.pem
+    fail: yes
+
+# Check several certs in one task
+- openssl_cert_check:
+    certs:
+      - cert: /etc/ssl/etcd/peer.pem
+        key: /etc/ssl/etcd/peer-key.pem
+        ca: /etc/ssl/etcd/ca.pem
+      - cert: /etc/ssl/etcd/client.pem
+        key: /etc/ssl/etcd/client-key.pem
+        ca: /etc/ssl/etcd/ca.pem
+  register: etcd_certs
+'''
+
+RETURN = '''
+results:
+    description: The checks for each item of C(certs); C(key_match) and
+                 C(chain_valid) are null when the key or CA file was not
+                 given or does not exist
+    returned: success
+    type: list
+    sample:
+      - cert: /etc/ssl/client/cert.pem
+        key: /etc/ssl/client/key.pem
+        ca: /etc/ssl/client/ca.pem
+        exists: true
+        key_match: true
+        chain_valid: false
+        chain_error: "unable to get local issuer certificate"
+        subject: {'CN': 'admin', 'O': 'EXAMPLE.COM'}
+        subjectAltName: [ 'email:admin@example.com' ]
+        not_before: "2017-06-01T12:00:00Z"
+        not_after: "2019-06-01T12:00:00Z"
+        expired: false
+        expires_in_days: 310
+missing:
+    description: True if any certificate does not exist
+    returned: success
+    type: bool
+    sample: false
+key_mismatch:
+    description: True if any certificate does not match its key
+    returned: success
+    type: bool
+    sample: false
+chain_invalid:
+    description: True if any certificate fails to verify against its CA bundle
+    returned: success
+    type: bool
+    sample: true
+expired:
+    description: True if any certificate has expired
+    returned: success
+    type: bool
+    sample: false
+'''
+
+import datetime
+import os
+import re
+
+try:
+    from OpenSSL import crypto
+except ImportError:
+    pyopenssl_found = False
+else:
+    pyopenssl_found = True
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native, to_text
+
+
+# PEM certificate blocks in a bundle
+pem_cert_re = re.compile(
+    b'-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----', re.DOTALL)
+
+
+class CertCheckError(Exception):
+    pass
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError) as exc:
+        raise CertCheckError('%s: %s' % (path, to_native(exc)))
+
+
+def asn1_time(value):
+    """Convert an ASN.1 'YYYYMMDDHHMMSSZ' time to a `datetime`."""
+    return datetime.datetime.strptime(to_text(value), '%Y%m%d%H%M%SZ')
+
+
+class CertChecker(object):
+    """Check certs, caching loaded keys and CA stores by path."""
+
+    def __init__(self):
+        self.keys = {}
+        self.stores = {}
+        self.now = datetime.datetime.utcnow()
+
+    def load_key(self, path):
+        if path not in self.keys:
+            try:
+                self.keys[path] = crypto.dump_publickey(
+                    crypto.FILETYPE_ASN1,
+                    crypto.load_privatekey(crypto.FILETYPE_PEM, read_file(path)))
+            except crypto.Error as exc:
+                raise CertCheckError('%s: %s' % (path, to_native(exc)))
+        return self.keys[path]
+
+    def load_store(self, path):
+        if path not in self.stores:
+            store = crypto.X509Store()
+            try:
+                for pem in pem_cert_re.findall(read_file(path)):
+                    store.add_cert(crypto.load_certificate(crypto.FILETYPE_PEM, pem))
+            except crypto.Error as exc:
+                raise CertCheckError('%s: %s' % (path, to_native(exc)))
+            self.stores[path] = store
+        return self.stores[path]
+
+    def check(self, item):
+        """Return the check results for one `certs` item."""
+
+        cert_path = item['cert']
+        key_path = item.get('key', None)
+        ca_path = item.get('ca', None)
+        res = dict(cert=cert_path, key=key_path, ca=ca_path,
+                   exists=os.path.exists(cert_path),
+                   key_match=None, chain_valid=None)
+        if not res['exists']:
+            return res
+
+        try:
+            cert = crypto.load_certificate(crypto.FILETYPE_PEM, read_file(cert_path))
+        except crypto.Error as exc:
+            raise CertCheckError('%s: %s' % (cert_path, to_native(exc)))
+
+        res['subject'] = dict((to_text(k), to_text(v))
+                              for (k, v) in cert.get_subject().get_components())
+        res['subjectAltName'] = []
+        for i in range(cert.get_extension_count()):
+            ext = cert.get_extension(i)
+            if ext.get_short_name() == b'subjectAltName':
+                res['subjectAltName'] = [
+                    s.strip().replace('IP Address:', 'IP:')
+                    for s in to_text(str(ext)).split(',')]
+
+        not_before = asn1_time(cert.get_notBefore())
+        not_after = asn1_time(cert.get_notAfter())
+        res['not_before'] = not_before.strftime('%Y-%m-%dT%H:%M:%SZ')
+        res['not_after'] = not_after.strftime('%Y-%m-%dT%H:%M:%SZ')
+        res['expired'] = self.now >= not_after
+        res['expires_in_days'] = (not_after - self.now).days
+
+        if key_path and os.path.exists(key_path):
+            res['key_match'] = self.load_key(key_path) == crypto.dump_publickey(
+                crypto.FILETYPE_ASN1, cert.get_pubkey())
+
+        if ca_path and os.path.exists(ca_path):
+            try:
+                crypto.X509StoreContext(self.load_store(ca_path), cert).verify_certificate()
+                res['chain_valid'] = True
+            except crypto.X509StoreContextError as exc:
+                res['chain_valid'] = False
+                res['chain_error'] = to_native(exc)
+
+        return res
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            certs=dict(type='list'),
+            cert=dict(type='path'),
+            key=dict(type='path'),
+            ca=dict(type='path'),
+            fail=dict(default=False, type='bool'),
+        ),
+        required_one_of=[['certs', 'cert']],
+        mutually_exclusive=[['certs', 'cert']],
+        supports_check_mode=True,
+    )
+
+    if not pyopenssl_found:
+        module.fail_json(msg='the python pyOpenSSL module is required')
+
+    if module.params['certs'] is not None:
+        certs = module.params['certs']
+    else:
+        certs = [dict((k, module.params[k]) for k in ('cert', 'key', 'ca'))]
+
+    checker = CertChecker()
+    results = []
+    try:
+        for item in certs:
+            if not isinstance(item, dict) or 'cert' not in item:
+                raise CertCheckError('certs items must be dicts with a cert key: %s' % item)
+            item = dict((k, os.path.expanduser(v) if v else v)
+                        for (k, v) in item.items())
+            results.append(checker.check(item))
+    except CertCheckError as exc:
+        module.fail_json(msg=to_native(exc), results=results)
+
+    result = dict(
+        changed=False,
+        results=results,
+        missing=any(not r['exists'] for r in results),
+        key_mismatch=any(r['key_match'] is False for r in results),
+        chain_invalid=any(r['chain_valid'] is False for r in results),
+        expired=any(r.get('expired', False) for r in results),
+    )
+
+    if module.params['fail']:
+        problems = ['missing', 'key_mismatch', 'chain_invalid', 'expired']
+        failed = [p for p in problems if result[p]]
+        if failed:
+            module.fail_json(msg='Certificate check failed: %s' % ', '.join(failed),
+                             **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
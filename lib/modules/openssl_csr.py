@@ -31,9 +31,10 @@ description:
     - "This module allows one to (re)generates OpenSSL certificate signing requests.
        It uses the pyOpenSSL python library to interact with openssl. This module support
        the subjectAltName extension. Note: At least one of commonName or subjectAltName must
-       be specified."
+       be specified. RSA, DSA, ECC and Ed25519 private keys are supported."
 requirements:
     - "python-pyOpenSSL"
+    - "python-cryptography (Ed25519 keys)"
 options:
     state:
         required: false
@@ -45,11 +46,13 @@ options:
         required: false
         default: "sha256"
         description:
-            - Digest used when signing the certificate signing request with the private key
+            - Digest used when signing the certificate signing request with the private key; ignored for Ed25519 keys,
+              which are signed without a separate digest
     privatekey_path:
-        required: true
+        required: false
         description:
-            - Path to the privatekey to use when signing the certificate signing request
+            - Path to the privatekey to use when signing the certificate signing request. Required unless C(requests)
+              is given.
     version:
         required: false
         default: 3
@@ -60,11 +63,30 @@ options:
         default: False
         choices: [ True, False ]
         description:
-            - Should the certificate signing request be forced regenerated by this ansible module
+            - Should the certificate signing request be forced regenerated by this ansible module. Without this, an
+              existing request is only regenerated if its subject, subjectAltName, public key or digest differ from
+              those requested.
     path:
-        required: true
+        required: false
+        description:
+            - Name of the folder in which the generated OpenSSL certificate signing request will be written. Required
+              unless C(requests) is given.
+    requests:
+        required: false
         description:
-            - Name of the folder in which the generated OpenSSL certificate signing request will be written
+            - List of certificate signing requests to manage in one task. Each item takes C(path),
+              C(privatekey_path), C(subjectAltName) and subject fields, either as top-level keys (C(commonName),
+              C(CN), ...) or in a C(subject) dict; other options given to the task apply to every item.
+              Item values are checked and converted like the module options; C(subjectAltName) may also be a
+              list of names. An item's C(state) may differ from the task's; C(privatekey_path) is only required
+              for items to be present.
+              Each private key is loaded once, however many requests share it, and requests are signed in a
+              pool of worker threads.
+    workers:
+        required: false
+        default: 4
+        description:
+            - Maximum number of requests signed concurrently in C(requests) mode
     subjectAltName:
         required: false
         description:
@@ -129,6 +151,18 @@ EXAMPLES = '''
     privatekey_path: /etc/ssl/private/ansible.com.pem
     subjectAltName: 'DNS:www.ansible.com,DNS:m.ansible.com'
 
+# Generate several Certificate Signing Requests in one task
+- openssl_csr:
+    organizationName: Ansible
+    requests:
+      - path: /etc/ssl/csr/etcd-peer.csr
+        privatekey_path: /etc/ssl/private/etcd.pem
+        subject: { CN: etcd-peer }
+        subjectAltName: 'DNS:host1.ansible.com,IP:10.0.0.1'
+      - path: /etc/ssl/csr/etcd-client.csr
+        privatekey_path: /etc/ssl/private/etcd.pem
+        commonName: etcd-client
+
 # Force re-generate an OpenSSL Certificate Signing Request
 - openssl_csr:
     path: /etc/ssl/csr/www.ansible.com.csr
@@ -154,10 +188,27 @@ subjectAltName:
     returned: changed or success
     type: string
     sample: 'DNS:www.ansible.com,DNS:m.ansible.com'
+mismatch:
+    description: The fields of an existing CSR that differed from those requested, causing it to be regenerated
+    returned: changed or success
+    type: list
+    sample: [ 'subjectAltName', 'publickey' ]
+requests:
+    description: In C(requests) mode, the result for each request, with the keys above plus C(changed)
+    returned: changed or success
+    type: list
+    sample:
+      - csr: /etc/ssl/csr/etcd-peer.csr
+        subject: {'CN': 'etcd-peer', 'O': 'Ansible'}
+        subjectAltName: 'DNS:host1.ansible.com,IP:10.0.0.1'
+        mismatch: []
+        changed: true
 '''
 
 import errno
 import os
+import tempfile
+from multiprocessing.pool import ThreadPool
 
 try:
     from OpenSSL import crypto
@@ -166,36 +217,219 @@ except ImportError:
 else:
     pyopenssl_found = True
 
+try:
+    import ipaddress
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    pass
+
+from crypto import is_ed25519
+
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils._text import to_native
+from ansible.module_utils._text import to_native, to_text
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import string_types
 
 
 class CertificateSigningRequestError(Exception):
     pass
 
 
+# Subject keys to cryptography name OIDs, for Ed25519 requests
+NAME_OIDS = {
+    'C': 'COUNTRY_NAME',
+    'ST': 'STATE_OR_PROVINCE_NAME',
+    'L': 'LOCALITY_NAME',
+    'O': 'ORGANIZATION_NAME',
+    'OU': 'ORGANIZATIONAL_UNIT_NAME',
+    'CN': 'COMMON_NAME',
+    'emailAddress': 'EMAIL_ADDRESS',
+}
+
+
+def parse_san(subjectAltName):
+    """Parse an OpenSSL-style 'DNS:a,email:b,IP:c,URI:d' string into
+    cryptography `GeneralName` objects."""
+
+    names = []
+    for item in subjectAltName.split(','):
+        kind, _, value = item.strip().partition(':')
+        if kind == 'DNS':
+            names.append(x509.DNSName(value))
+        elif kind == 'email':
+            names.append(x509.RFC822Name(value))
+        elif kind in ('IP', 'IP Address'):
+            names.append(x509.IPAddress(ipaddress.ip_address(to_text(value))))
+        elif kind == 'URI':
+            names.append(x509.UniformResourceIdentifier(value))
+        else:
+            raise CertificateSigningRequestError(
+                'Unsupported subjectAltName type for Ed25519 keys: %s' % item)
+    return names
+
+
+# Subject field option names, with their aliases
+SUBJECT_OPTIONS = {
+    'countryName': 'C',
+    'stateOrProvinceName': 'ST',
+    'localityName': 'L',
+    'organizationName': 'O',
+    'organizationalUnitName': 'OU',
+    'commonName': 'CN',
+    'emailAddress': 'E',
+}
+
+
+def write_request(path, request_pem):
+    """Atomically write a PEM CSR to `path` via a temporary file."""
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                               prefix='.%s.' % os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(request_pem)
+        os.rename(tmp, path)
+    except (IOError, OSError) as exc:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise CertificateSigningRequestError(exc)
+
+
+def item_list(value):
+    """Convert a list option given as a comma separated string, as Ansible does."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, string_types):
+        return [v.strip() for v in value.split(',')]
+    if isinstance(value, (int, float)):
+        return [str(value)]
+    raise TypeError('%s cannot be converted to a list' % (type(value).__name__,))
+
+
+def item_dict(value):
+    if isinstance(value, dict):
+        return value
+    raise TypeError('%s cannot be converted to a dict' % (type(value).__name__,))
+
+
+# Conversions of `requests` item values, by argument_spec type
+item_types = {
+    'str': to_native,
+    'path': lambda value: os.path.expanduser(to_native(value)),
+    'bool': lambda value: boolean(value, strict=True),
+    'int': int,
+    'list': item_list,
+    'dict': item_dict,
+    'raw': lambda value: value,
+}
+
+
+def request_params(params, item, argument_spec):
+    """Return module params for one item of the `requests` option; the
+    item's settings override the task's, and are checked and converted
+    like the module options.  `subjectAltName` may also be a list."""
+
+    if not isinstance(item, dict):
+        raise CertificateSigningRequestError('requests items must be dicts: %s' % item)
+    item = dict(item)
+    for (key, value) in (item.pop('subject', None) or {}).items():
+        item[key] = value
+    res = dict(params, requests=None)
+    for (key, value) in item.items():
+        for (option, alias) in SUBJECT_OPTIONS.items():
+            if key == alias:
+                key = option
+        if key not in res:
+            raise CertificateSigningRequestError('Unknown requests item key: %s' % key)
+        # Like an option set to null, a null value keeps the default
+        if value is None:
+            continue
+        if key == 'subjectAltName' and isinstance(value, list):
+            value = ','.join(to_native(v) for v in value)
+        spec = argument_spec.get(key, {})
+        try:
+            value = item_types[spec.get('type', 'str')](value)
+        except (TypeError, ValueError) as exc:
+            raise CertificateSigningRequestError(
+                "Bad %s '%s' in requests item, must be of type %s: %s"
+                % (key, value, spec.get('type', 'str'), exc))
+        if 'choices' in spec and value not in spec['choices']:
+            raise CertificateSigningRequestError(
+                "Bad %s '%s' in requests item, must be one of: %s"
+                % (key, value, ', '.join(str(c) for c in spec['choices'])))
+        res[key] = value
+    required = ('path', 'privatekey_path') if res['state'] == 'present' else ('path',)
+    for key in required:
+        if not res[key]:
+            raise CertificateSigningRequestError('requests item is missing %s: %s' % (key, item))
+    if res['state'] == 'present' and not (res['commonName'] or res['subjectAltName']):
+        raise CertificateSigningRequestError(
+            'requests item needs one of commonName or subjectAltName: %s' % item)
+    return res
+
+
+def normalize_san(subjectAltName):
+    """Return a set of 'type:value' SAN strings, with the 'IP Address'
+    type printed by OpenSSL shortened to 'IP'."""
+
+    res = set()
+    for item in (subjectAltName or '').split(','):
+        kind, _, value = item.strip().partition(':')
+        if not kind:
+            continue
+        if kind == 'IP Address':
+            kind = 'IP'
+        res.add('%s:%s' % (kind, value.strip()))
+    return res
+
+
+def sign_ed25519_request(privatekey, subject, subjectAltName):
+    """Build and sign a CSR with an Ed25519 key; return it in PEM format.
+
+    pyOpenSSL's `X509Req.sign()` always requires a digest, which Ed25519
+    does not use, so these requests are built with cryptography."""
+
+    builder = x509.CertificateSigningRequestBuilder().subject_name(
+        x509.Name([x509.NameAttribute(getattr(NameOID, NAME_OIDS[k]), to_text(v))
+                   for (k, v) in subject.items()]))
+    if subjectAltName is not None:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName(parse_san(subjectAltName)), critical=False)
+    request = builder.sign(privatekey.to_cryptography_key(), None, default_backend())
+    return request.public_bytes(serialization.Encoding.PEM)
+
+
 class CertificateSigningRequest(object):
 
-    def __init__(self, module):
-        self.state = module.params['state']
-        self.digest = module.params['digest']
-        self.force = module.params['force']
-        self.subjectAltName = module.params['subjectAltName']
-        self.path = module.params['path']
-        self.privatekey_path = module.params['privatekey_path']
-        self.version = module.params['version']
+    def __init__(self, module, params=None, keys=None):
+        if params is None:
+            params = module.params
+        self.params = params
+        self.state = params['state']
+        self.digest = params['digest']
+        self.force = params['force']
+        self.subjectAltName = params['subjectAltName']
+        self.path = params['path']
+        self.privatekey_path = params['privatekey_path']
+        self.version = params['version']
         self.changed = True
         self.request = None
         self.privatekey = None
+        self.mismatch = []
+        # Private keys already loaded, by path; shared between requests
+        self.keys = {} if keys is None else keys
 
         self.subject = {
-            'C': module.params['countryName'],
-            'ST': module.params['stateOrProvinceName'],
-            'L': module.params['localityName'],
-            'O': module.params['organizationName'],
-            'OU': module.params['organizationalUnitName'],
-            'CN': module.params['commonName'],
-            'emailAddress': module.params['emailAddress'],
+            'C': params['countryName'],
+            'ST': params['stateOrProvinceName'],
+            'L': params['localityName'],
+            'O': params['organizationName'],
+            'OU': params['organizationalUnitName'],
+            'CN': params['commonName'],
+            'emailAddress': params['emailAddress'],
         }
 
         if self.subjectAltName is None:
@@ -203,10 +437,79 @@ class CertificateSigningRequest(object):
 
         self.subject = dict((k, v) for k, v in self.subject.items() if v)
 
-    def generate(self, module):
-        '''Generate the certificate signing request.'''
+    def load_privatekey(self):
+        '''Load the private key, once.'''
+
+        if self.privatekey is None:
+            if self.privatekey_path not in self.keys:
+                try:
+                    with open(self.privatekey_path, 'rb') as f:
+                        self.keys[self.privatekey_path] = crypto.load_privatekey(
+                            crypto.FILETYPE_PEM, f.read())
+                except (IOError, OSError, crypto.Error) as exc:
+                    raise CertificateSigningRequestError(exc)
+            self.privatekey = self.keys[self.privatekey_path]
+        return self.privatekey
+
+    def check(self):
+        '''Compare an existing CSR against the requested one, and return
+        the list of fields that differ; parsing failures count as a
+        difference.'''
 
-        if not os.path.exists(self.path) or self.force:
+        try:
+            with open(self.path, 'rb') as f:
+                req = crypto.load_certificate_request(crypto.FILETYPE_PEM, f.read())
+        except (IOError, OSError, crypto.Error):
+            return ['csr']
+
+        mismatch = []
+
+        subject = dict((to_text(k), to_text(v))
+                       for (k, v) in req.get_subject().get_components())
+        if subject != dict((k, to_text(v)) for (k, v) in self.subject.items()):
+            mismatch.append('subject')
+
+        san = None
+        for ext in req.get_extensions():
+            if ext.get_short_name() == b'subjectAltName':
+                san = str(ext)
+        if normalize_san(san) != normalize_san(self.subjectAltName):
+            mismatch.append('subjectAltName')
+
+        privatekey = self.load_privatekey()
+        if crypto.dump_publickey(crypto.FILETYPE_ASN1, req.get_pubkey()) != \
+           crypto.dump_publickey(crypto.FILETYPE_ASN1, privatekey):
+            mismatch.append('publickey')
+
+        if not is_ed25519(privatekey) and hasattr(req, 'to_cryptography'):
+            algorithm = req.to_cryptography().signature_hash_algorithm
+            if algorithm is None or algorithm.name != self.digest.lower():
+                mismatch.append('digest')
+
+        return mismatch
+
+    def compare(self):
+        '''Set `changed` if the CSR is missing, forced or differs from
+        the requested one.'''
+
+        if not self.force and os.path.exists(self.path):
+            self.mismatch = self.check()
+        self.changed = not os.path.exists(self.path) or self.force or bool(self.mismatch)
+
+    def needs_update(self):
+        '''Compare the CSR and load the private key; return `changed`.'''
+
+        self.compare()
+        self.load_privatekey()
+        return self.changed
+
+    def sign(self):
+        '''Build, sign and write the certificate signing request.'''
+
+        if is_ed25519(self.privatekey):
+            request_pem = sign_ed25519_request(
+                self.privatekey, self.subject, self.subjectAltName)
+        else:
             req = crypto.X509Req()
             req.set_version(self.version)
             subject = req.get_subject()
@@ -217,26 +520,27 @@ class CertificateSigningRequest(object):
             if self.subjectAltName is not None:
                 req.add_extensions([crypto.X509Extension(b"subjectAltName", False, self.subjectAltName.encode('ascii'))])
 
-            privatekey_content = open(self.privatekey_path).read()
-            self.privatekey = crypto.load_privatekey(crypto.FILETYPE_PEM, privatekey_content)
-
             req.set_pubkey(self.privatekey)
             req.sign(self.privatekey, self.digest)
             self.request = req
+            request_pem = crypto.dump_certificate_request(crypto.FILETYPE_PEM, self.request)
 
-            try:
-                csr_file = open(self.path, 'wb')
-                csr_file.write(crypto.dump_certificate_request(crypto.FILETYPE_PEM, self.request))
-                csr_file.close()
-            except (IOError, OSError) as exc:
-                raise CertificateSigningRequestError(exc)
-        else:
-            self.changed = False
+        write_request(self.path, request_pem)
+
+    def set_attributes(self, module):
+        '''Apply the file common arguments to the CSR file.'''
 
-        file_args = module.load_file_common_arguments(module.params)
+        file_args = module.load_file_common_arguments(self.params)
         if module.set_fs_attributes_if_different(file_args, False):
             self.changed = True
 
+    def generate(self, module):
+        '''Generate the certificate signing request.'''
+
+        if self.needs_update():
+            self.sign()
+        self.set_attributes(module)
+
     def remove(self):
         '''Remove the Certificate Signing Request.'''
 
@@ -255,22 +559,90 @@ class CertificateSigningRequest(object):
             'csr': self.path,
             'subject': self.subject,
             'subjectAltName': self.subjectAltName,
+            'mismatch': self.mismatch,
             'changed': self.changed
         }
 
         return result
 
 
+class CertificateSigningRequests(object):
+    '''Manage the list of CSRs in the `requests` option; each item's
+    `state`, by default the task's, says whether to generate or remove
+    it.'''
+
+    def __init__(self, module):
+        keys = {}
+        self.workers = module.params['workers']
+        self.csrs = [CertificateSigningRequest(module, request_params(module.params, item, module.argument_spec), keys)
+                     for item in module.params['requests']]
+        self.changed = False
+
+    def compare(self):
+        '''Compare existing CSRs with those requested, for check mode.'''
+
+        for csr in self.csrs:
+            if csr.state == 'present':
+                csr.compare()
+            else:
+                csr.changed = os.path.exists(csr.path)
+        self.changed = any(csr.changed for csr in self.csrs)
+
+    def generate(self, module):
+        '''Sign all CSRs needing an update across a thread pool, and remove
+        those not wanted.'''
+
+        todo = [csr for csr in self.csrs
+                if csr.state == 'present' and csr.needs_update()]
+
+        def sign(csr):
+            try:
+                csr.sign()
+            except (CertificateSigningRequestError, crypto.Error, ValueError) as exc:
+                return '%s: %s' % (csr.path, to_native(exc))
+
+        if len(todo) > 1 and self.workers > 1:
+            pool = ThreadPool(min(self.workers, len(todo)))
+            try:
+                errors = pool.map(sign, todo)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            errors = [sign(csr) for csr in todo]
+        errors = [e for e in errors if e is not None]
+        if errors:
+            raise CertificateSigningRequestError('; '.join(errors))
+
+        for csr in self.csrs:
+            if csr.state == 'present':
+                csr.set_attributes(module)
+            else:
+                csr.changed = os.path.exists(csr.path)
+                csr.remove()
+        self.changed = any(csr.changed for csr in self.csrs)
+
+    def dump(self):
+        '''Serialize the object into a dictionary.'''
+
+        return {
+            'requests': [csr.dump() for csr in self.csrs],
+            'changed': self.changed,
+        }
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
             state=dict(default='present', choices=['present', 'absent'], type='str'),
             digest=dict(default='sha256', type='str'),
-            privatekey_path=dict(require=True, type='path'),
+            privatekey_path=dict(type='path'),
             version=dict(default='3', type='int'),
             force=dict(default=False, type='bool'),
             subjectAltName=dict(aliases=['subjectAltName'], type='str'),
-            path=dict(required=True, type='path'),
+            path=dict(type='path'),
+            requests=dict(type='list'),
+            workers=dict(default=4, type='int'),
             countryName=dict(aliases=['C'], type='str'),
             stateOrProvinceName=dict(aliases=['ST'], type='str'),
             localityName=dict(aliases=['L'], type='str'),
@@ -281,26 +653,40 @@ def main():
         ),
         add_file_common_args=True,
         supports_check_mode=True,
-        required_one_of=[['commonName', 'subjectAltName']],
+        required_one_of=[['commonName', 'subjectAltName', 'requests']],
+        mutually_exclusive=[['path', 'requests']],
     )
 
     if not pyopenssl_found:
         module.fail_json(msg='the python pyOpenSSL module is required')
 
-    path = module.params['path']
-    base_dir = os.path.dirname(module.params['path'])
-
-    if not os.path.isdir(base_dir):
-        module.fail_json(name=path, msg='The directory %s does not exist' % path)
+    if module.params['requests'] is not None:
+        try:
+            csr = CertificateSigningRequests(module)
+        except CertificateSigningRequestError as exc:
+            module.fail_json(msg=to_native(exc))
+        paths = [c.path for c in csr.csrs]
+    else:
+        required = ('path', 'privatekey_path') if module.params['state'] == 'present' else ('path',)
+        for key in required:
+            if not module.params[key]:
+                module.fail_json(msg='missing required arguments: %s' % key)
+        csr = CertificateSigningRequest(module)
+        paths = [module.params['path']]
 
-    csr = CertificateSigningRequest(module)
+    for path in paths:
+        base_dir = os.path.dirname(path)
+        if not os.path.isdir(base_dir):
+            module.fail_json(name=path, msg='The directory %s does not exist' % path)
 
-    if module.params['state'] == 'present':
+    if module.params['state'] == 'present' or module.params['requests'] is not None:
 
         if module.check_mode:
-            result = csr.dump()
-            result['changed'] = module.params['force'] or not os.path.exists(path)
-            module.exit_json(**result)
+            try:
+                csr.compare()
+            except CertificateSigningRequestError as exc:
+                module.fail_json(msg=to_native(exc))
+            module.exit_json(**csr.dump())
 
         try:
             csr.generate(module)
@@ -311,7 +697,7 @@ def main():
 
         if module.check_mode:
             result = csr.dump()
-            result['changed'] = os.path.exists(path)
+            result['changed'] = any(os.path.exists(p) for p in paths)
             module.exit_json(**result)
 
         try:
@@ -30,9 +30,11 @@ short_description: Generate OpenSSL private keys.
 description:
     - "This module allows one to (re)generate OpenSSL private keys. It uses
        the pyOpenSSL python library to interact with openssl. One can generate
-       either RSA or DSA private keys. Keys are generated in PEM format."
+       RSA, DSA, ECC (NIST P-256 or P-384) or Ed25519 private keys. Keys are
+       generated in PEM format."
 requirements:
     - "python-pyOpenSSL"
+    - "python-cryptography (ECC and Ed25519 keys; Ed25519 needs cryptography >= 2.6 and pyOpenSSL >= 20.0)"
 options:
     state:
         required: false
@@ -44,13 +46,19 @@ options:
         required: false
         default: 4096
         description:
-            - Size (in bits) of the TLS/SSL key to generate
+            - Size (in bits) of the TLS/SSL key to generate; ignored for ECC and Ed25519 keys
     type:
         required: false
         default: "RSA"
-        choices: [ RSA, DSA ]
+        choices: [ RSA, DSA, ECC, Ed25519 ]
         description:
             - The algorithm used to generate the TLS/SSL private key
+    curve:
+        required: false
+        default: "secp256r1"
+        choices: [ secp256r1, secp384r1 ]
+        description:
+            - Elliptic curve used to generate C(ECC) keys; NIST P-256 or P-384
     force:
         required: false
         default: False
@@ -58,9 +66,30 @@ options:
         description:
             - Should the key be regenerated even it it already exists
     path:
-        required: true
+        required: false
         description:
             - Name of the file in which the generated TLS/SSL private key will be written. It will have 0600 mode.
+              One of C(path) or C(paths) is required.
+    paths:
+        required: false
+        description:
+            - List of private key files to manage with the same settings. Missing keys are generated in parallel
+              across a pool of worker processes.
+    workers:
+        required: false
+        default: number of CPUs
+        description:
+            - Maximum number of worker processes generating keys in C(paths) mode
+    fingerprint_algorithms:
+        required: false
+        default: [ sha256 ]
+        description:
+            - hashlib digest algorithms used to fingerprint the public key
+    fingerprint_cache:
+        required: false
+        description:
+            - File in which to cache public key fingerprints by key file path, mtime, size and inode, so that
+              unchanged keys are not parsed and hashed again on later runs
 '''
 
 EXAMPLES = '''
@@ -83,6 +112,31 @@ EXAMPLES = '''
 - openssl_privatekey:
     path: /etc/ssl/private/ansible.com.pem
     type: DSA
+
+# Generate an ECDSA private key on the NIST P-256 curve
+- openssl_privatekey:
+    path: /etc/ssl/private/ansible.com.pem
+    type: ECC
+    curve: secp256r1
+
+# Generate an Ed25519 private key
+- openssl_privatekey:
+    path: /etc/ssl/private/ansible.com.pem
+    type: Ed25519
+
+# Generate keys for many services at once, in parallel
+- openssl_privatekey:
+    paths:
+      - /etc/ssl/private/etcd-peer.pem
+      - /etc/ssl/private/etcd-client.pem
+      - /etc/ssl/private/kubelet.pem
+
+# Return every available fingerprint digest, and cache fingerprints
+# across runs
+- openssl_privatekey:
+    path: /etc/ssl/private/ansible.com.pem
+    fingerprint_algorithms: [ md5, sha1, sha256, sha512 ]
+    fingerprint_cache: /etc/ssl/private/.fingerprints.json
 '''
 
 RETURN = '''
@@ -102,23 +156,35 @@ filename:
     type: string
     sample: /etc/ssl/private/ansible.com.pem
 fingerprint:
-    description: The fingerprint of the public key. Fingerprint will be generated for each hashlib.algorithms available.
+    description: The fingerprint of the public key. Fingerprint will be generated for each of fingerprint_algorithms.
                  Requires PyOpenSSL >= 16.0 for meaningful output.
     returned: changed or success
     type: dict
     sample:
-      md5: "84:75:71:72:8d:04:b5:6c:4d:37:6d:66:83:f5:4c:29"
-      sha1: "51:cc:7c:68:5d:eb:41:43:88:7e:1a:ae:c7:f8:24:72:ee:71:f6:10"
-      sha224: "b1:19:a6:6c:14:ac:33:1d:ed:18:50:d3:06:5c:b2:32:91:f1:f1:52:8c:cb:d5:75:e9:f5:9b:46"
       sha256: "41:ab:c7:cb:d5:5f:30:60:46:99:ac:d4:00:70:cf:a1:76:4f:24:5d:10:24:57:5d:51:6e:09:97:df:2f:de:c7"
-      sha384: "85:39:50:4e:de:d9:19:33:40:70:ae:10:ab:59:24:19:51:c3:a2:e4:0b:1c:b1:6e:dd:b3:0c:d9:9e:6a:46:af:da:18:f8:ef:ae:2e:c0:9a:75:2c:9b:b3:0f:3a:5f:3d"
-      sha512: "fd:ed:5e:39:48:5f:9f:fe:7f:25:06:3f:79:08:cd:ee:a5:e7:b3:3d:13:82:87:1f:84:e1:f5:c7:28:77:53:94:86:56:38:69:f0:d9:35:22:01:1e:a6:60:...:0f:9b"
+keys:
+    description: In C(paths) mode, the result for each key file; C(elapsed) is the generation time in seconds
+    returned: changed or success
+    type: list
+    sample:
+      - filename: /etc/ssl/private/etcd-peer.pem
+        changed: true
+        elapsed: 2.31
+        fingerprint:
+          sha256: "41:ab:c7:cb:d5:5f:30:60:46:99:ac:d4:00:70:cf:a1:76:4f:24:5d:10:24:57:5d:51:6e:09:97:df:2f:de:c7"
+elapsed:
+    description: In C(paths) mode, total wall clock time in seconds
+    returned: changed or success
+    type: float
+    sample: 4.87
 '''
 
 import errno
 from ansible.module_utils.basic import AnsibleModule
 # from ansible.module_utils.crypto import get_fingerprint
-from crypto import get_fingerprint
+from crypto import get_fingerprint, fingerprint_key, ALL_ALGORITHMS, \
+    load_fingerprint_cache, save_fingerprint_cache, generate_privatekey, \
+    KEY_TYPES, CURVES
 from ansible.module_utils.pycompat24 import get_exception
 
 try:
@@ -128,7 +194,10 @@ except ImportError:
 else:
     pyopenssl_found = True
 
+import multiprocessing
 import os
+import tempfile
+import time
 from ansible.module_utils._text import to_native
 
 
@@ -136,6 +205,60 @@ class PrivateKeyError(Exception):
     pass
 
 
+def new_privatekey(key_type, size, curve):
+    """Generate a `crypto.PKey` of `key_type`."""
+
+    try:
+        return generate_privatekey(key_type, size, curve)
+    except (TypeError, ValueError) as exc:
+        raise PrivateKeyError(exc)
+
+
+def write_privatekey(path, privatekey, mode):
+    """Atomically write a private key in PEM format to `path`.
+
+    The key is written to a temporary file in the same directory, which
+    is renamed over `path` once complete, so a reader never sees a
+    partially written key.  `mode` may be an int or an octal string;
+    symbolic modes like `u=rw` are applied afterwards by
+    `set_fs_attributes_if_different()`, so the key is written 0600."""
+
+    if not isinstance(mode, int):
+        try:
+            mode = int(str(mode), 8)
+        except ValueError:
+            mode = int('0600', 8)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                               prefix='.%s.' % os.path.basename(path))
+    try:
+        os.fchmod(fd, mode)
+        os.write(fd, crypto.dump_privatekey(crypto.FILETYPE_PEM, privatekey))
+        os.fsync(fd)
+        os.close(fd)
+        fd = None
+        os.rename(tmp, path)
+    except (IOError, OSError) as exc:
+        if fd is not None:
+            os.close(fd)
+        os.remove(tmp)
+        raise PrivateKeyError(exc)
+
+
+def _pool_generate(args):
+    """Generate and write one key in a worker process."""
+
+    path, key_type, size, curve, mode, algorithms = args
+    start = time.time()
+    try:
+        privatekey = new_privatekey(key_type, size, curve)
+        write_privatekey(path, privatekey, mode)
+    except PrivateKeyError as exc:
+        return dict(filename=path, error=to_native(exc),
+                    elapsed=round(time.time() - start, 2))
+    return dict(filename=path, fingerprint=fingerprint_key(privatekey, algorithms),
+                elapsed=round(time.time() - start, 2))
+
+
 class PrivateKey(object):
 
     def __init__(self, module):
@@ -143,12 +266,14 @@ class PrivateKey(object):
         self.state = module.params['state']
         self.name = os.path.basename(module.params['path'])
         self.type = module.params['type']
+        self.curve = module.params['curve']
         self.force = module.params['force']
         self.path = module.params['path']
         self.mode = module.params['mode']
         self.changed = True
         self.privatekey = None
         self.fingerprint = {}
+        self.fingerprint_algorithms = module.params['fingerprint_algorithms']
         self.check_mode = module.check_mode
 
 
@@ -156,32 +281,13 @@ class PrivateKey(object):
         """Generate a keypair."""
 
         if not os.path.exists(self.path) or self.force:
-            self.privatekey = crypto.PKey()
-
-            if self.type == 'RSA':
-                crypto_type = crypto.TYPE_RSA
-            else:
-                crypto_type = crypto.TYPE_DSA
-
-            try:
-                self.privatekey.generate_key(crypto_type, self.size)
-            except (TypeError, ValueError) as exc:
-                raise PrivateKeyError(exc)
-
-            try:
-                privatekey_file = os.open(self.path,
-                                          os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
-                                          self.mode)
-
-                os.write(privatekey_file, crypto.dump_privatekey(crypto.FILETYPE_PEM, self.privatekey))
-                os.close(privatekey_file)
-            except IOError as exc:
-                self.remove()
-                raise PrivateKeyError(exc)
+            self.privatekey = new_privatekey(self.type, self.size, self.curve)
+            write_privatekey(self.path, self.privatekey, self.mode)
         else:
             self.changed = False
 
-        self.fingerprint = get_fingerprint(self.path)
+        self.fingerprint = get_fingerprint(
+            self.path, self.fingerprint_algorithms, self.privatekey)
         file_args = module.load_file_common_arguments(module.params)
         if module.set_fs_attributes_if_different(file_args, False):
             self.changed = True
@@ -213,16 +319,109 @@ class PrivateKey(object):
         return result
 
 
+class PrivateKeys(object):
+    """Manage a list of private key files with the same settings."""
+
+    def __init__(self, module):
+        self.paths = module.params['paths']
+        self.state = module.params['state']
+        self.type = module.params['type']
+        self.size = module.params['size']
+        self.curve = module.params['curve']
+        self.force = module.params['force']
+        self.mode = module.params['mode']
+        self.workers = module.params['workers'] or multiprocessing.cpu_count()
+        self.fingerprint_algorithms = module.params['fingerprint_algorithms']
+        self.keys = [dict(filename=path, changed=False) for path in self.paths]
+        self.changed = False
+        self.elapsed = 0.0
+
+    def missing(self):
+        """Return the paths whose keys need (re)generating."""
+        return [path for path in self.paths
+                if self.force or not os.path.exists(path)]
+
+    def generate(self, module):
+        """Generate missing keys across a pool of worker processes."""
+
+        start = time.time()
+        todo = set(self.missing())
+        jobs = [(path, self.type, self.size, self.curve, self.mode,
+                 self.fingerprint_algorithms)
+                for path in self.paths if path in todo]
+        if len(jobs) > 1 and self.workers > 1:
+            pool = multiprocessing.Pool(min(self.workers, len(jobs)))
+            try:
+                results = pool.map(_pool_generate, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [_pool_generate(job) for job in jobs]
+        results = dict((r['filename'], r) for r in results)
+
+        errors = []
+        for key in self.keys:
+            path = key['filename']
+            if path in results:
+                key.update(results[path])
+                if 'error' in key:
+                    errors.append('%s: %s' % (path, key['error']))
+                    continue
+                key['changed'] = True
+            else:
+                key['fingerprint'] = get_fingerprint(
+                    path, self.fingerprint_algorithms)
+            file_args = module.load_file_common_arguments(
+                dict(module.params, path=path))
+            if module.set_fs_attributes_if_different(file_args, False):
+                key['changed'] = True
+        self.changed = any(key['changed'] for key in self.keys)
+        self.elapsed = round(time.time() - start, 2)
+        if errors:
+            raise PrivateKeyError('; '.join(errors))
+
+    def remove(self):
+        """Remove the private keys from the filesystem."""
+
+        for key in self.keys:
+            try:
+                os.remove(key['filename'])
+                key['changed'] = True
+            except OSError as exc:
+                if exc.errno != errno.ENOENT:
+                    raise PrivateKeyError(exc)
+        self.changed = any(key['changed'] for key in self.keys)
+
+    def dump(self):
+        """Serialize the object into a dictionary."""
+
+        return {
+            'size': self.size,
+            'type': self.type,
+            'changed': self.changed,
+            'keys': self.keys,
+            'elapsed': self.elapsed,
+        }
+
+
 def main():
 
     module = AnsibleModule(
         argument_spec = dict(
             state=dict(default='present', choices=['present', 'absent'], type='str'),
             size=dict(default=4096, type='int'),
-            type=dict(default='RSA', choices=['RSA', 'DSA'], type='str'),
+            type=dict(default='RSA', choices=list(KEY_TYPES), type='str'),
+            curve=dict(default='secp256r1', choices=sorted(CURVES), type='str'),
             force=dict(default=False, type='bool'),
-            path=dict(required=True, type='path'),
+            path=dict(type='path'),
+            paths=dict(type='list'),
+            workers=dict(type='int'),
+            fingerprint_algorithms=dict(default=['sha256'], type='list'),
+            fingerprint_cache=dict(type='path'),
         ),
+        mutually_exclusive = [['path', 'paths']],
+        required_one_of = [['path', 'paths']],
         supports_check_mode = True,
         add_file_common_args = True,
     )
@@ -231,31 +430,53 @@ def main():
         module.fail_json(msg='the python pyOpenSSL module is required')
 
     path = module.params['path']
-    base_dir = os.path.dirname(module.params['path'])
+    if module.params['paths'] is not None:
+        module.params['paths'] = [os.path.expanduser(p) for p in module.params['paths']]
+        paths = module.params['paths']
+    else:
+        paths = [path]
+
+    for base_dir in set(os.path.dirname(p) for p in paths):
+        if not os.path.isdir(base_dir):
+            module.fail_json(name=base_dir, msg='The directory %s does not exist or the file is not a directory' % base_dir)
 
-    if not os.path.isdir(base_dir):
-        module.fail_json(name=base_dir, msg='The directory %s does not exist or the file is not a directory' % base_dir)
+    unknown = set(module.params['fingerprint_algorithms']) - set(ALL_ALGORITHMS)
+    if unknown:
+        module.fail_json(msg='Unknown fingerprint algorithms: %s' % ', '.join(sorted(unknown)))
+
+    cache_file = module.params['fingerprint_cache']
+    if cache_file:
+        load_fingerprint_cache(cache_file)
 
     if not module.params['mode']:
         module.params['mode'] = int('0600', 8)
 
-    private_key = PrivateKey(module)
+    if module.params['paths'] is not None:
+        private_key = PrivateKeys(module)
+    else:
+        private_key = PrivateKey(module)
     if private_key.state == 'present':
 
         if module.check_mode:
             result = private_key.dump()
-            result['changed'] = module.params['force'] or not os.path.exists(path)
+            result['changed'] = any(module.params['force'] or not os.path.exists(p) for p in paths)
             module.exit_json(**result)
 
         try:
             private_key.generate(module)
         except PrivateKeyError as exc:
             module.fail_json(msg=to_native(exc))
+
+        if cache_file:
+            try:
+                save_fingerprint_cache(cache_file)
+            except (IOError, OSError) as exc:
+                module.warn('Unable to save fingerprint cache: %s' % to_native(exc))
     else:
 
         if module.check_mode:
             result = private_key.dump()
-            result['changed'] = os.path.exists(path)
+            result['changed'] = any(os.path.exists(p) for p in paths)
             module.exit_json(**result)
 
         try:
@@ -44,14 +44,36 @@ notes:
     installed on the system is before version 3.1, the module queries the kernel
     through C(/sys/) to obtain disk information. In this case the units CHS and
     CYL are not supported.
+  - The module runs C(parted) at most twice per task, once to read the
+    partition table and once to apply any changes and print the result.
 requirements:
   - This module requires parted version 1.8.3 and above.
   - If the version of parted is below 3.1, it requires a Linux version running
     the sysfs file system C(/sys/).
 options:
   device:
-    description: The block device (disk) where to operate.
-    required: True
+    description:
+     - The block device (disk) where to operate.  One of C(device) or
+       C(devices) is required.
+  devices:
+    description:
+     - A list of block devices to operate on, each either a device path or a
+       dict with a C(device) key and any other options of this module
+       (C(label), C(layout), C(number), ...), which override the task's
+       options for that device.  Item values are checked and converted like
+       the module options.  Devices are probed and partitioned
+       concurrently, and per-device results are returned in C(devices).
+  workers:
+    description: Maximum number of devices handled concurrently with C(devices).
+    default: 8
+  native_read:
+    description:
+     - Read GPT and plain MBR partition tables directly from the device
+       instead of running C(parted print), when the labels, partition types
+       and unit allow.  Values are exact rather than rounded as parted
+       prints them, and the disk model comes from C(/sys).  Parted is still
+       used for other labels and to apply changes.
+    default: no
   align:
     description: Set alignment for newly created partitions.
     choices: ['none', 'cylinder', 'minimal', 'optimal']
@@ -105,6 +127,17 @@ options:
      - Sets the name for the partition number (GPT, Mac, MIPS and PC98 only).
   flags:
     description: A list of the flags that has to be set on the partition.
+  layout:
+    description:
+     - A list of partitions for the whole disk, each a dict of C(number) and
+       optionally C(part_type), C(fs_type), C(part_start) (or C(start)),
+       C(part_end) (or C(end)), C(name) and C(flags).  Options given to the
+       task are defaults for each partition.  Missing partitions are created
+       and names and flags updated with a single parted script; existing
+       partitions are not moved or resized, and partitions not in the list
+       are left alone.  With C(layout), C(label) is only written to a disk
+       with no partition table, so an existing table is never wiped.
+       Requires C(state=present).
   state:
     description:
      - If to create or delete a partition. If set to C(info) the module will
@@ -152,6 +185,13 @@ partition_info:
           "size": 4.0
         }]
       }
+devices:
+  description:
+   - With C(devices), the result for each device, with C(device), C(changed),
+     C(disk), C(partitions) and C(script) keys as for a single device, or
+     C(failed) and C(msg) if the device failed.
+  returned: success
+  type: list
 '''
 
 EXAMPLES = """
@@ -182,6 +222,31 @@ EXAMPLES = """
     state: present
     part_start: 1GiB
 
+# Label a disk and create all of its partitions in one task
+- parted:
+    device: /dev/sdb
+    label: gpt
+    state: present
+    unit: GiB
+    layout:
+      - number: 1
+        fs_type: linux-swap
+        part_end: 1GiB
+      - number: 2
+        fs_type: ext4
+        part_start: 1GiB
+        name: data
+
+# Partition several volumes at once
+- parted:
+    devices:
+      - device: /dev/sdb
+        layout: [ { number: 1 } ]
+      - device: /dev/sdc
+        layout: [ { number: 1, part_end: 50% }, { number: 2, part_start: 50% } ]
+    label: gpt
+    state: present
+
 # Read device information (always use unit when probing)
 - parted: device=/dev/sdb unit=MiB
   register: sdb_info
@@ -197,10 +262,17 @@ EXAMPLES = """
 
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import string_types
+from multiprocessing.pool import ThreadPool
 import locale
 import math
 import re
 import os
+import struct
+import uuid
+import zlib
 
 
 # Reference prefixes (International System of Units and IEC)
@@ -208,6 +280,22 @@ units_si  = ['B', 'KB', 'MB', 'GB', 'TB']
 units_iec = ['B', 'KiB', 'MiB', 'GiB', 'TiB']
 parted_units = units_si + units_iec + ['s', '%', 'cyl', 'chs', 'compact']
 
+# mkpart file system types
+fs_types = ['ext4', 'fat16', 'fat32', 'ext2', 'HFS', 'linux-swap', 'NTFS',
+            'reiserfs', 'ufs']
+
+
+class PartedError(Exception):
+    """
+    Raised instead of calling `module.fail_json()` while working on a device,
+    so that one device's failure can be reported along with the others'
+    results in `devices` mode.
+    """
+    def __init__(self, msg, **kwargs):
+        super(PartedError, self).__init__(msg)
+        self.msg = msg
+        self.kwargs = kwargs
+
 
 def parse_unit(size_str, unit=''):
     """
@@ -218,8 +306,8 @@ def parse_unit(size_str, unit=''):
         # "<cylinder>,<head>,<sector>" format
         matches = re.search(r'^(\d+),(\d+),(\d+)$', size_str)
         if matches is None:
-            module.fail_json(
-                msg="Error interpreting parted size output: '%s'" % size_str
+            raise PartedError(
+                "Error interpreting parted size output: '%s'" % size_str
             )
 
         size = {
@@ -264,6 +352,13 @@ def parse_partition_info(parted_output, unit):
     """
     lines = [x for x in parted_output.split('\n') if x.strip() != '']
 
+    # Skip any script output preceding the table, which starts with the
+    # unit line
+    for i, line in enumerate(lines):
+        if line.strip() in ('BYT;', 'CHS;', 'CYL;'):
+            lines = lines[i:]
+            break
+
     # Generic device info
     generic_params = lines[1].rstrip(';').split(':')
 
@@ -304,11 +399,13 @@ def parse_partition_info(parted_output, unit):
         if unit != 'chs':
             size   = parse_unit(part_params[3])[0]
             fstype = part_params[4]
+            name   = part_params[5]
             flags  = part_params[6]
 
         else:
             size   = ""
             fstype = part_params[3]
+            name   = part_params[4]
             flags  = part_params[5]
 
         parts.append({
@@ -317,6 +414,7 @@ def parse_partition_info(parted_output, unit):
             'end':    parse_unit(part_params[2])[0],
             'size':   size,
             'fstype': fstype,
+            'name':   name,
             'flags':  [f.strip() for f in flags.split(', ') if f != ''],
             'unit':  unit.lower(),
         })
@@ -337,7 +435,7 @@ def format_disk_size(size_bytes, unit):
 
     # Shortcut
     if size_bytes == 0:
-        return 0.0
+        return 0.0, unit
 
     # Cases where we default to 'compact'
     if unit in ['', 'compact', 'cyl', 'chs']:
@@ -346,14 +444,16 @@ def format_disk_size(size_bytes, unit):
         ))
         unit = 'b'
         if index < len(units_si):
-            unit = units_si[index]
+            unit = units_si[index].lower()
 
-    # Find the appropriate multiplier
+    # Find the appropriate multiplier; the unit lists are mixed case
     multiplier = 1.0
-    if unit in units_si:
-        multiplier = 1000.0 ** units_si.index(unit)
-    elif unit in units_iec:
-        multiplier = 1024.0 ** units_iec.index(unit)
+    si = [u.lower() for u in units_si]
+    iec = [u.lower() for u in units_iec]
+    if unit in si:
+        multiplier = 1000.0 ** si.index(unit)
+    elif unit in iec:
+        multiplier = 1024.0 ** iec.index(unit)
 
     output = size_bytes / multiplier * (1 + 1E-16)
 
@@ -407,98 +507,323 @@ def get_unlabeled_device_info(device, unit):
     }
 
 
-def get_device_info(device, unit):
+# Partition types understood by `read_partition_table()`, with the flags
+# parted reports for them
+gpt_type_flags = {
+    '0fc63daf-8483-4772-8e79-3d69d8477de4': [],                 # Linux data
+    'c12a7328-f81f-11d2-ba4b-00a0c93ec93b': ['boot', 'esp'],    # EFI system
+    '21686148-6449-6e6f-744e-656564454649': ['bios_grub'],      # BIOS boot
+    'e6d6d379-f507-44c2-a23c-238f2a3df928': ['lvm'],            # Linux LVM
+    'a19d880f-05fc-4d3b-a006-743f0f84911e': ['raid'],           # Linux RAID
+    '0657fd6d-a4ab-43c4-84e5-0933c84b4f4f': ['swap'],           # Linux swap
+}
+mbr_type_flags = {
+    0x83: [],           # Linux
+    0x82: [],           # Linux swap
+    0x8e: ['lvm'],      # Linux LVM
+    0xfd: ['raid'],     # Linux RAID autodetect
+}
+
+# Units `read_partition_table()` can express exactly
+native_units = ['B', 's'] + units_si + units_iec
+
+
+def pread(fd, size, offset):
+    """
+    Reads `size` bytes at `offset` from a file descriptor.
+    """
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def probe_fstype(fd, offset):
+    """
+    Identifies the file system at `offset` by its signature, naming it as
+    parted does; returns '' if unknown.
+    """
+    sb = pread(fd, 1024 + 104, offset)
+    if len(sb) == 1024 + 104 and sb[1024 + 56:1024 + 58] == b'\x53\xef':
+        compat, incompat = struct.unpack('<II', sb[1024 + 92:1024 + 100])
+        # extents, 64bit or flex_bg
+        if incompat & (0x40 | 0x80 | 0x200):
+            return 'ext4'
+        # has_journal
+        if compat & 0x4:
+            return 'ext3'
+        return 'ext2'
+    if sb[:4] == b'XFSB':
+        return 'xfs'
+    if pread(fd, 10, offset + 4096 - 10) in (b'SWAPSPACE2', b'SWAP-SPACE'):
+        return 'linux-swap(v1)'
+    if pread(fd, 8, offset + 0x10040) == b'_BHRfS_M':
+        return 'btrfs'
+    return ''
+
+
+def read_partition_table(device, unit):
+    """
+    Reads a GPT or plain MBR partition table directly from the device,
+    returning the same structure as `parse_partition_info()` with values
+    computed exactly from byte offsets rather than rounded by parted.
+
+    Returns None when parted is needed: for units other than
+    `native_units`, unreadable devices, other labels, extended
+    partitions, partition types or GPT attributes not listed above, and
+    GPT headers failing their CRC checks.  File systems are detected for
+    ext2/3/4, xfs, linux-swap and btrfs only.
+    """
+    if unit not in native_units:
+        return None
+
+    base = "/sys/block/%s" % os.path.basename(os.path.realpath(device))
+    try:
+        fd = os.open(device, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        size_bytes = os.lseek(fd, 0, os.SEEK_END)
+        logic_block = int(read_record(base + "/queue/logical_block_size", 512))
+        phys_block = int(read_record(base + "/queue/physical_block_size",
+                                     logic_block))
+
+        mbr = pread(fd, 512, 0)
+        if len(mbr) < 512 or mbr[510:512] != b'\x55\xaa':
+            return None
+        entries = [struct.unpack('<B3sB3sII', mbr[446 + 16 * i:462 + 16 * i])
+                   for i in range(4)]
+
+        parts = []
+        if any(e[2] == 0xee for e in entries):
+            # Protective MBR:  read the GPT header and entries
+            table = 'gpt'
+            header = pread(fd, 92, logic_block)
+            if len(header) < 92 or header[:8] != b'EFI PART':
+                return None
+            (hsize, hcrc, entries_lba, num_entries, entry_size,
+             entries_crc) = struct.unpack('<12xII', header[:20]) + \
+                struct.unpack('<QIII', header[72:92])
+            check = header[:16] + b'\0\0\0\0' + header[20:hsize] \
+                if hsize <= 92 else None
+            if check is None or zlib.crc32(check) & 0xffffffff != hcrc:
+                return None
+            data = pread(fd, num_entries * entry_size, entries_lba * logic_block)
+            if zlib.crc32(data) & 0xffffffff != entries_crc:
+                return None
+            for i in range(num_entries):
+                entry = data[i * entry_size:(i + 1) * entry_size]
+                type_guid = str(uuid.UUID(bytes_le=entry[:16]))
+                if type_guid == '00000000-0000-0000-0000-000000000000':
+                    continue
+                first, last, attrs = struct.unpack('<QQQ', entry[32:56])
+                if type_guid not in gpt_type_flags or attrs:
+                    return None
+                name = entry[56:128].decode('utf-16-le').split('\0')[0]
+                parts.append((i + 1, first, last, gpt_type_flags[type_guid],
+                              name))
+        else:
+            table = 'msdos'
+            for i, (status, _, ptype, _, first, count) in enumerate(entries):
+                if ptype == 0:
+                    continue
+                if ptype not in mbr_type_flags:
+                    return None
+                flags = list(mbr_type_flags[ptype])
+                if status & 0x80:
+                    flags.insert(0, 'boot')
+                parts.append((i + 1, first, first + count - 1, flags, ''))
+
+        # Convert from bytes to the unit; ends are the last byte
+        # (or sector) of the partition, as parted prints them
+        if unit == 's':
+            conv = lambda b: float(b // logic_block)
+        elif unit == 'B':
+            conv = float
+        elif unit in units_si:
+            conv = lambda b: b / 1000.0 ** units_si.index(unit)
+        else:
+            conv = lambda b: b / 1024.0 ** units_iec.index(unit)
+
+        vendor = read_record(base + "/device/vendor", "Unknown")
+        model = read_record(base + "/device/model", "model")
+
+        partitions = []
+        for num, first, last, flags, name in sorted(parts):
+            begin = first * logic_block
+            end = (last + 1) * logic_block - 1
+            partitions.append({
+                'num':    num,
+                'begin':  conv(begin),
+                'end':    conv(end),
+                'size':   conv(end - begin + 1),
+                'fstype': probe_fstype(fd, begin),
+                'name':   name,
+                'flags':  flags,
+                'unit':   unit.lower(),
+            })
+
+        return {
+            'generic': {
+                'dev':            device,
+                'size':           conv(size_bytes),
+                'unit':           unit.lower(),
+                'table':          table,
+                'model':          "%s %s" % (vendor, model),
+                'logical_block':  logic_block,
+                'physical_block': phys_block,
+            },
+            'partitions': partitions,
+        }
+    except (OSError, IOError, struct.error, UnicodeDecodeError, ValueError):
+        return None
+    finally:
+        os.close(fd)
+
+
+def get_device_info(device, unit, native=False):
     """
     Fetches information about a disk and its partitions and it returns a
-    dictionary.
+    dictionary.  With `native`, first try reading the partition table
+    directly, without running parted.
     """
     global module, parted_exec
 
-    # If parted complains about missing labels, it means there are no partitions.
-    # In this case only, use a custom function to fetch information and emulate
-    # parted formats for the unit.
-    label_needed = check_parted_label(device)
-    if label_needed:
-        return get_unlabeled_device_info(device, unit)
+    if native:
+        info = read_partition_table(device, unit)
+        if info is not None:
+            return info
 
     command = "%s -s -m %s -- unit '%s' print" % (parted_exec, device, unit)
     rc, out, err = module.run_command(command)
-    if rc != 0 and 'unrecognised disk label' not in err:
-        module.fail_json(msg=(
+
+    label_missing = 'unrecognised disk label' in (out + err).lower()
+    if rc != 0 and not label_missing:
+        raise PartedError(
             "Error while getting device information with parted "
-            "script: '%s'" % command),
+            "script: '%s'" % command,
             rc=rc, out=out, err=err
         )
 
+    # If parted complains about missing labels, it means there are no
+    # partitions.  Parted versions prior to 3.1 don't return data when
+    # there is no label, printing the complaint in the stdout instead; in
+    # this case only, fetch information from the kernel through /sys and
+    # emulate parted formats for the unit, rather than running parted
+    # again to check its version.  For more information see:
+    # http://upstream.rosalinux.ru/changelogs/libparted/3.1/changelog.html
+    if label_missing and not re.search(r'^(BYT|CHS|CYL);', out, re.M):
+        return get_unlabeled_device_info(device, unit)
+
     return parse_partition_info(out, unit)
 
 
-def check_parted_label(device):
+def parted(script, device, align, unit):
     """
-    Determines if parted needs a label to complete its duties. Versions prior
-    to 3.1 don't return data when there is no label. For more information see:
-    http://upstream.rosalinux.ru/changelogs/libparted/3.1/changelog.html
+    Runs a parted script, followed by a print of the resulting table in the
+    same parted run.  Returns the parsed table, or None in check mode.
     """
-    global parted_exec
+    global module, parted_exec
 
-    # Check the version
-    parted_major, parted_minor, _ = parted_version()
-    if (parted_major == 3 and parted_minor >= 1) or parted_major > 3:
-        return False
+    if script and not module.check_mode:
+        command = "%s -s -m -a %s %s -- %s unit '%s' print" % (
+            parted_exec, align, device, script, unit)
+        rc, out, err = module.run_command(command)
 
-    # Older parted versions return a message in the stdout and RC > 0.
-    rc, out, err = module.run_command("%s -s -m %s print" % (parted_exec, device))
-    if rc != 0 and 'unrecognised disk label' in out.lower():
-        return True
+        if rc != 0:
+            raise PartedError(
+                "Error while running parted script: %s" % command.strip(),
+                rc=rc, out=out, err=err
+            )
+
+        return parse_partition_info(out, unit)
 
-    return False
+    return None
 
 
-def parted_version():
+def partition_script(current_parts, number, part_type, fs_type, part_start,
+                     part_end, name, flags):
     """
-    Returns the major and minor version of parted installed on the system.
+    Returns the parted commands needed to create partition `number` if
+    missing and set its name and flags.
     """
-    global module, parted_exec
+    global module
 
-    rc, out, err = module.run_command("%s --version" % parted_exec)
-    if rc != 0:
-        module.fail_json(
-            msg="Failed to get parted version.", rc=rc, out=out, err=err
+    script = ""
+
+    # Create partition if required; a new partition has no name or
+    # flags, so name and flags are set in the same script
+    partition = None
+    if part_exists(current_parts, 'num', number):
+        partition = [p for p in current_parts if p['num'] == number][0]
+    elif part_type:
+        script += "mkpart %s %s %s %s " % (
+            part_type,
+            fs_type,
+            part_start,
+            part_end
         )
+        partition = {'flags': [], 'name': ''}
+    elif module.check_mode:
+        partition = {'flags': [], 'name': ''}  # Empty structure for the check-mode
 
-    lines = [x for x in out.split('\n') if x.strip() != '']
-    if len(lines) == 0:
-        module.fail_json(msg="Failed to get parted version.", rc=0, out=out)
+    if partition is not None:
+        # Assign name to the the partition
+        if name and name != partition['name']:
+            script += "name %s %s " % (number, name)
 
-    matches = re.search(r'^parted.+(\d+)\.(\d+)(?:\.(\d+))?$', lines[0])
-    if matches is None:
-        module.fail_json(msg="Failed to get parted version.", rc=0, out=out)
+        # Manage flags
+        if flags:
+            # Compute only the changes in flags status
+            flags_off = list(set(partition['flags']) - set(flags))
+            flags_on  = list(set(flags) - set(partition['flags']))
 
-    # Convert version to numbers
-    major = int(matches.group(1))
-    minor = int(matches.group(2))
-    rev   = 0
-    if matches.group(3) is not None:
-        rev = int(matches.group(3))
+            for f in flags_on:
+                script += "set %s %s on " % (number, f)
 
-    return major, minor, rev
+            for f in flags_off:
+                script += "set %s %s off " % (number, f)
 
+    return script
 
-def parted(script, device, align):
+
+def layout_partitions(layout, defaults):
     """
-    Runs a parted script.
+    Checks the `layout` parameter and fills in defaults from the task
+    parameters; returns the partitions sorted by number.
     """
-    global module, parted_exec
-
-    if script and not module.check_mode:
-        command = "%s -s -m -a %s %s -- %s" % (parted_exec, align, device, script)
-        rc, out, err = module.run_command(command)
-
-        if rc != 0:
-            module.fail_json(
-                msg="Error while running parted script: %s" % command.strip(),
-                rc=rc, out=out, err=err
-            )
+    parts = []
+    for item in layout:
+        if not isinstance(item, dict) or 'number' not in item:
+            raise PartedError(
+                "Each 'layout' item must be a dict with a 'number' key",
+                item=item)
+        part = dict(defaults)
+        for key, value in item.items():
+            key = {'start': 'part_start', 'end': 'part_end'}.get(key, key)
+            if key not in part:
+                raise PartedError(
+                    "Unknown key '%s' in 'layout' item" % key, item=item)
+            part[key] = value
+        try:
+            part['number'] = int(part['number'])
+        except (TypeError, ValueError):
+            raise PartedError("Bad partition number in 'layout'", item=item)
+        if part['number'] < 0:
+            raise PartedError("The partition number must be non negative.")
+        for key in ('part_start', 'part_end'):
+            if not check_size_format(str(part[key])):
+                raise PartedError(
+                    "The layout '%s' value doesn't respect required format."
+                    "The size unit is case sensitive." % key, item=item)
+        if part['fs_type'] and part['fs_type'] not in fs_types:
+            raise PartedError(
+                "Unknown fs_type '%s' in 'layout'" % part['fs_type'],
+                item=item)
+        part['fs_type'] = part['fs_type'] or ''
+        parts.append(part)
+
+    return sorted(parts, key=lambda p: p['number'])
 
 
 def read_record(file_path, default=None):
@@ -534,15 +859,205 @@ def check_size_format(size_str):
     return unit in parted_units
 
 
-def main():
-    global module, units_si, units_iec, parted_exec
+def item_list(value):
+    """
+    Converts a list option given as a comma separated string, as Ansible does.
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, string_types):
+        return [v.strip() for v in value.split(',')]
+    if isinstance(value, (int, float)):
+        return [str(value)]
+    raise TypeError('%s cannot be converted to a list' % type(value).__name__)
+
+
+# Conversions of `devices` item values, by argument_spec type
+item_types = {
+    'str': to_native,
+    'bool': lambda value: boolean(value, strict=True),
+    'int': int,
+    'list': item_list,
+}
+
+
+def device_params(params, device, argument_spec):
+    """
+    Returns the parameters for one item of the `devices` parameter, which is
+    either a device path or a dict of parameters overriding the task's,
+    checked and converted like the module options.
+    """
+    if not isinstance(device, dict):
+        device = {'device': device}
+    if not device.get('device', None):
+        raise PartedError("Each 'devices' item needs a 'device'", item=device)
+    res = dict(params, devices=None)
+    for key, value in device.items():
+        if key not in device_keys:
+            raise PartedError(
+                "Unknown key '%s' in 'devices' item" % key, item=device)
+        # Like an option set to null, a null value keeps the default
+        if value is None:
+            continue
+        spec = argument_spec[key]
+        try:
+            value = item_types[spec['type']](value)
+        except (TypeError, ValueError) as e:
+            raise PartedError(
+                "Bad %s '%s' in 'devices' item, must be of type %s: %s"
+                % (key, value, spec['type'], e), item=device)
+        if 'choices' in spec and value not in spec['choices']:
+            raise PartedError(
+                "Bad %s '%s' in 'devices' item, must be one of: %s"
+                % (key, value, ', '.join(spec['choices'])), item=device)
+        res[key] = value
+    return res
+
+
+def check_params(params):
+    """
+    Checks and conditions the parameters for one device; returns them.
+    """
+    params = dict(params)
+    params['fs_type'] = params['fs_type'] or ''
+    number = params['number']
+    if number is not None:
+        try:
+            number = params['number'] = int(number)
+        except (TypeError, ValueError):
+            raise PartedError("The partition number must be an integer.")
+    if number and number < 0:
+        raise PartedError("The partition number must be non negative.")
+    if not check_size_format(params['part_start']):
+        raise PartedError(
+            "The argument 'part_start' doesn't respect required format."
+            "The size unit is case sensitive.",
+            err=parse_unit(params['part_start'])
+        )
+    if not check_size_format(params['part_end']):
+        raise PartedError(
+            "The argument 'part_end' doesn't respect required format."
+            "The size unit is case sensitive.",
+            err=parse_unit(params['part_end'])
+        )
+    if params['layout'] is not None:
+        if params['state'] != 'present':
+            raise PartedError("The 'layout' argument requires state=present")
+        params['layout'] = layout_partitions(params['layout'], dict(
+            number=None, part_type=params['part_type'] or 'primary',
+            fs_type=params['fs_type'], part_start=params['part_start'],
+            part_end=params['part_end'], name=params['name'],
+            flags=params['flags']))
+    return params
+
+
+def manage_device(params):
+    """
+    Reads one device's table, applies the requested changes and returns the
+    module result for the device.
+    """
+    global module
 
     changed = False
     output_script = ""
     script = ""
+
+    # Data extraction
+    device      = params['device']
+    align       = params['align']
+    number      = params['number']
+    unit        = params['unit']
+    label       = params['label']
+    part_type   = params['part_type']
+    fs_type     = params['fs_type']
+    part_start  = params['part_start']
+    part_end    = params['part_end']
+    name        = params['name']
+    state       = params['state']
+    flags       = params['flags']
+    layout      = params['layout']
+
+    # Read the current disk information
+    current_device = get_device_info(device, unit, params['native_read'])
+    current_parts = current_device['partitions']
+    final_device = current_device
+
+    if state == 'present':
+        table = current_device['generic']['table']
+
+        # Default value for the label
+        if (not table or table == 'unknown') and not label:
+            label = 'msdos'
+
+        # Assign label if required; a new label has no partitions.  In
+        # layout mode, only label a disk with no partition table.
+        if label and label != table and \
+           (layout is None or not table or table == 'unknown'):
+            script += "mklabel %s " % label
+            current_parts = []
+
+        if layout is None:
+            script += partition_script(
+                current_parts, number, part_type, fs_type, part_start,
+                part_end, name, flags)
+        else:
+            for part in layout:
+                script += partition_script(
+                    current_parts, part['number'], part['part_type'],
+                    part['fs_type'], part['part_start'], part['part_end'],
+                    part['name'], part['flags'])
+
+        # Set the unit of the run
+        if unit and script:
+            script = "unit %s %s" % (unit, script)
+
+        # Execute the script, which also prints the final table
+        if script:
+            output_script += script
+            changed = True
+            final_device = parted(script, device, align, unit) or final_device
+
+    elif state == 'absent':
+        # Remove the partition
+        if part_exists(current_parts, 'num', number) or module.check_mode:
+            script = "rm %s " % number
+            output_script += script
+            changed = True
+            final_device = parted(script, device, align, unit) or final_device
+
+    elif state == 'info':
+        output_script = "unit '%s' print " % unit
+
+    # Final status of the device
+    return dict(
+        changed=changed,
+        device=device,
+        disk=final_device['generic'],
+        partitions=final_device['partitions'],
+        script=output_script.strip()
+    )
+
+
+# Keys allowed in `devices` items
+device_keys = ['device', 'align', 'number', 'unit', 'label', 'part_type',
+               'fs_type', 'part_start', 'part_end', 'name', 'flags', 'layout',
+               'state', 'native_read']
+
+
+def main():
+    global module, units_si, units_iec, parted_exec
+
     module = AnsibleModule(
         argument_spec={
-            'device': {'required': True, 'type': 'str'},
+            'device': {'type': 'str'},
+
+            # list of devices, each a path or dict of parameters
+            'devices': {'type': 'list'},
+            'workers': {'default': 8, 'type': 'int'},
+
+            # read partition tables without parted when possible
+            'native_read': {'default': False, 'type': 'bool'},
+
             'align': {
                 'default': 'optimal',
                 'choices': ['none', 'cylinder', 'minimal', 'optimal'],
@@ -572,8 +1087,7 @@ def main():
                 'type': 'str'
             },
             'fs_type': {
-                'choices': ['ext4', 'fat16', 'fat32', 'ext2', 'HFS',
-                            'linux-swap', 'NTFS', 'reiserfs', 'ufs'],
+                'choices': fs_types,
                 'type': 'str'
             },
             'part_start': {'default': '0%', 'type': 'str'},
@@ -585,6 +1099,9 @@ def main():
             # set <partition> <flag> <state> command
             'flags': {'type': 'list'},
 
+            # whole-disk list of partitions
+            'layout': {'type': 'list'},
+
             # rm/mkpart command
             'state': {
                 'choices': ['present', 'absent', 'info'],
@@ -592,130 +1109,53 @@ def main():
                 'type': 'str'
             }
         },
+        required_one_of=[['device', 'devices']],
+        mutually_exclusive=[['device', 'devices']],
         supports_check_mode=True,
     )
 
-    # Data extraction
-    device      = module.params['device']
-    align       = module.params['align']
-    number      = module.params['number']
-    unit        = module.params['unit']
-    label       = module.params['label']
-    part_type   = module.params['part_type']
-    fs_type     = module.params['fs_type'] or ''
-    part_start  = module.params['part_start']
-    part_end    = module.params['part_end']
-    name        = module.params['name']
-    state       = module.params['state']
-    flags       = module.params['flags']
-
     # Parted executable
     parted_exec = module.get_bin_path('parted', True)
 
-    # Conditioning
-    if number and number < 0:
-        module.fail_json(msg="The partition number must be non negative.")
-    if not check_size_format(part_start):
-        module.fail_json(
-            msg="The argument 'part_start' doesn't respect required format."
-                "The size unit is case sensitive.",
-            err=parse_unit(part_start)
-        )
-    if not check_size_format(part_end):
-        module.fail_json(
-            msg="The argument 'part_end' doesn't respect required format."
-                "The size unit is case sensitive.",
-            err=parse_unit(part_end)
-        )
-
-    # Read the current disk information
-    current_device = get_device_info(device, unit)
-    current_parts = current_device['partitions']
-
-    if state == 'present':
-        # Default value for the label
-        if not current_device['generic']['table'] or \
-           current_device['generic']['table'] == 'unknown' and \
-           not label:
-            label = 'msdos'
-
-        # Assign label if required
-        if label:
-            script += "mklabel %s " % label
-
-        # Create partition if required
-        if part_type and not part_exists(current_parts, 'num', number):
-            script += "mkpart %s %s %s %s " % (
-                part_type,
-                fs_type,
-                part_start,
-                part_end
-            )
-
-        # Set the unit of the run
-        if unit and script:
-            script = "unit %s %s" % (unit, script)
-
-        # Execute the script and update the data structure.
-        # This will create the partition for the next steps
-        if script:
-            output_script += script
-            parted(script, device, align)
-            changed = True
-            script = ""
-
-            current_parts = get_device_info(device, unit)['partitions']
-
-        if part_exists(current_parts, 'num', number) or module.check_mode:
-            partition = {'flags': []}      # Empty structure for the check-mode
-            if not module.check_mode:
-                partition = [p for p in current_parts if p['num'] == number][0]
-
-            # Assign name to the the partition
-            if name:
-                script += "name %s %s " % (number, name)
-
-            # Manage flags
-            if flags:
-                # Compute only the changes in flags status
-                flags_off = list(set(partition['flags']) - set(flags))
-                flags_on  = list(set(flags) - set(partition['flags']))
-
-                for f in flags_on:
-                    script += "set %s %s on " % (number, f)
-
-                for f in flags_off:
-                    script += "set %s %s off " % (number, f)
-
-        # Set the unit of the run
-        if unit and script:
-            script = "unit %s %s" % (unit, script)
-
-        # Execute the script
-        if script:
-            output_script += script
-            changed = True
-            parted(script, device, align)
-
-    elif state == 'absent':
-        # Remove the partition
-        if part_exists(current_parts, 'num', number) or module.check_mode:
-            script = "rm %s " % number
-            output_script += script
-            changed = True
-            parted(script, device, align)
-
-    elif state == 'info':
-        output_script = "unit '%s' print " % unit
-
-    # Final status of the device
-    final_device_status = get_device_info(device, unit)
-    module.exit_json(
-        changed=changed,
-        disk=final_device_status['generic'],
-        partitions=final_device_status['partitions'],
-        script=output_script.strip()
+    try:
+        if module.params['devices'] is None:
+            # Single device
+            result = manage_device(check_params(module.params))
+            module.exit_json(**result)
+
+        # Validate all devices' parameters before touching any of them
+        devices = [check_params(device_params(module.params, d, module.argument_spec))
+                   for d in module.params['devices']]
+    except PartedError as e:
+        module.fail_json(msg=e.msg, **e.kwargs)
+
+    # Devices are independent, so probe and partition them concurrently
+    def run(params):
+        try:
+            return manage_device(params)
+        except PartedError as e:
+            res = dict(e.kwargs, failed=True, msg=e.msg)
+            res['device'] = params['device']
+            return res
+
+    workers = max(1, min(module.params['workers'], len(devices)))
+    pool = ThreadPool(workers)
+    try:
+        results = pool.map(run, devices)
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = [r['device'] for r in results if r.get('failed', False)]
+    result = dict(
+        changed=any(r.get('changed', False) for r in results),
+        devices=results,
     )
+    if failed:
+        module.fail_json(
+            msg="Failed to partition devices: %s" % ', '.join(failed),
+            **result)
+    module.exit_json(**result)
 
 
 if __name__ == '__main__':
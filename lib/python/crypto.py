@@ -23,26 +23,176 @@ except ImportError:
     # user know that OpenSSL couldn't be found.
     pass
 
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.asymmetric import ec
+except ImportError:
+    ec = None
+
+try:
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+except ImportError:
+    # cryptography < 2.6
+    ed25519 = None
+
 import hashlib
+import json
+import os
+import tempfile
+
+# Digests computed when no algorithms are requested
+DEFAULT_ALGORITHMS = ('sha256',)
+
+# All fixed-length digests available from hashlib; `hashlib.algorithms`
+# is Python 2.7-only
+ALL_ALGORITHMS = tuple(sorted(
+    a for a in getattr(hashlib, 'algorithms_guaranteed',
+                       getattr(hashlib, 'algorithms', DEFAULT_ALGORITHMS))
+    if not a.startswith('shake_')))
+
+# In-process fingerprint cache:  stat key -> {algo: fingerprint}
+_cache = {}
+
 
+def _stat_key(path):
+    """Return the cache key for a key file:  (path, mtime, size, inode)"""
+    st = os.stat(path)
+    return (os.path.realpath(path), st.st_mtime, st.st_size, st.st_ino)
 
-def get_fingerprint(path):
-    """Generate the fingerprint of the public key. """
 
+def _colons(hexdigest):
+    return ':'.join(hexdigest[i:i + 2] for i in range(0, len(hexdigest), 2))
+
+
+def digest_publickey(publickey, algorithms=None):
+    """Return a dict of algo:fingerprint for DER-encoded public key
+    bytes"""
     fingerprint = {}
+    for algo in (algorithms or DEFAULT_ALGORITHMS):
+        fingerprint[algo] = _colons(hashlib.new(algo, publickey).hexdigest())
+    return fingerprint
 
-    privatekey = crypto.load_privatekey(crypto.FILETYPE_PEM, open(path, 'r').read())
 
+def fingerprint_key(privatekey, algorithms=None):
+    """Return the fingerprint of a loaded `crypto.PKey`'s public key"""
     try:
         publickey = crypto.dump_publickey(crypto.FILETYPE_ASN1, privatekey)
-        for algo in hashlib.algorithms:
-            f = getattr(hashlib, algo)
-            pubkey_digest = f(publickey).hexdigest()
-            fingerprint[algo] = ':'.join(pubkey_digest[i:i + 2] for i in range(0, len(pubkey_digest), 2))
     except AttributeError:
         # If PyOpenSSL < 16.0 crypto.dump_publickey() will fail.
         # By doing this we prevent the code from raising an error
         # yet we return no value in the fingerprint hash.
-        pass
+        return {}
+    return digest_publickey(publickey, algorithms)
 
-    return fingerprint
+
+def get_fingerprint(path, algorithms=None, privatekey=None):
+    """Generate the fingerprint of the public key.
+
+    Only the digests in `algorithms` (default `DEFAULT_ALGORITHMS`) are
+    computed.  Results are cached by file path, mtime, size and inode,
+    so the key is only parsed again after it changes.  A `privatekey`
+    already loaded from `path` may be passed to skip reading the
+    file."""
+
+    algorithms = tuple(algorithms or DEFAULT_ALGORITHMS)
+    key = _stat_key(path)
+    cached = _cache.get(key, {})
+    missing = [a for a in algorithms if a not in cached]
+    if missing:
+        if privatekey is None:
+            with open(path, 'rb') as f:
+                privatekey = crypto.load_privatekey(
+                    crypto.FILETYPE_PEM, f.read())
+        new = fingerprint_key(privatekey, missing)
+        if not new:
+            return {}
+        cached = dict(cached, **new)
+        _cache[key] = cached
+
+    return dict((a, cached[a]) for a in algorithms)
+
+
+def get_fingerprints(paths, algorithms=None):
+    """Return a dict of path:fingerprint for many key files"""
+    return dict((path, get_fingerprint(path, algorithms)) for path in paths)
+
+
+def load_fingerprint_cache(cache_file):
+    """Load fingerprints saved by `save_fingerprint_cache()`; entries
+    whose key file has since changed are dropped"""
+    try:
+        with open(cache_file, 'r') as f:
+            entries = json.load(f)
+    except (IOError, OSError, ValueError):
+        return
+    for entry in entries:
+        key = tuple(entry['key'])
+        try:
+            if _stat_key(key[0]) != key:
+                continue
+        except OSError:
+            continue
+        _cache.setdefault(key, {}).update(entry['fingerprint'])
+
+
+def save_fingerprint_cache(cache_file):
+    """Atomically write the fingerprint cache to `cache_file`"""
+    entries = [dict(key=list(k), fingerprint=v) for k, v in _cache.items()]
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache_file) or '.',
+                               prefix='.fingerprints-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.rename(tmp, cache_file)
+    except (IOError, OSError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# Private key types accepted by `generate_privatekey()`
+KEY_TYPES = ('RSA', 'DSA', 'ECC', 'Ed25519')
+
+# Elliptic curves for 'ECC' keys:  name -> cryptography curve class name
+CURVES = {
+    'secp256r1': 'SECP256R1',   # NIST P-256
+    'secp384r1': 'SECP384R1',   # NIST P-384
+}
+
+
+def generate_privatekey(key_type, size=None, curve='secp256r1'):
+    """Generate a `crypto.PKey` of `key_type`, one of `KEY_TYPES`.
+
+    `size` is the key size in bits for RSA and DSA keys; `curve` is one
+    of `CURVES` for ECC keys.  ECC and Ed25519 keys are generated with
+    `cryptography` and wrapped, since pyOpenSSL cannot generate them.
+    Raises `ValueError` on bad arguments."""
+
+    if key_type in ('RSA', 'DSA'):
+        privatekey = crypto.PKey()
+        privatekey.generate_key(
+            crypto.TYPE_RSA if key_type == 'RSA' else crypto.TYPE_DSA, size)
+        return privatekey
+
+    if key_type == 'ECC':
+        if ec is None:
+            raise ValueError('ECC keys require the python cryptography module')
+        if curve not in CURVES:
+            raise ValueError('Unsupported curve: %s' % curve)
+        key = ec.generate_private_key(
+            getattr(ec, CURVES[curve])(), default_backend())
+    elif key_type == 'Ed25519':
+        if ed25519 is None:
+            raise ValueError('Ed25519 keys require cryptography >= 2.6')
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError('Unsupported key type: %s' % key_type)
+
+    return crypto.PKey.from_cryptography_key(key)
+
+
+def is_ed25519(privatekey):
+    """Return True if a `crypto.PKey` is an Ed25519 key, which must be
+    signed with no digest"""
+    return ed25519 is not None and isinstance(
+        privatekey.to_cryptography_key(), ed25519.Ed25519PrivateKey)
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+#
+# DigitalOcean API helpers shared by the `do_*` action plugins
+#
+# DigitalOcean enforces a per-token request limit.  When many forks
+# provision droplets in parallel, uncoordinated calls exhaust it and
+# the API answers `429 Too Many Requests`.  The `RateLimitedDoManager`
+# class below wraps the `dopy` manager so that:
+#
+# - All forks (and concurrent `ansible-playbook` runs) using the same
+#   token draw from one token bucket, whose state is kept in a
+#   `flock()`ed JSON file
+# - The `RateLimit-Remaining`/`RateLimit-Reset` headers returned by
+#   the API are written back into the bucket, so every fork sees the
+#   server's view of the budget
+# - `429` and `5xx` responses are retried, honouring `Retry-After`,
+#   with jittered exponential backoff otherwise
+# - Time spent waiting is recorded per call and reported by `stats()`
+
+import fcntl
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import requests
+    from dopy.manager import DoManager, DoError
+except ImportError:
+    # An error will be raised in the calling plugin to let the end
+    # user know that `dopy` couldn't be found.
+    DoManager = object
+    DoError = Exception
+
+
+# DigitalOcean allows 5000 requests per hour, and 250 per minute
+BUCKET_CAPACITY = 250
+BUCKET_RATE = 250 / 60.0
+
+# Droplet listing page size, and max droplets per multi-create request
+LIST_PAGE_SIZE = 200
+CREATE_BATCH_SIZE = 10
+
+# Retry parameters for rate-limited and failed requests
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def rate_limit_file(api_token):
+    """Return the default bucket state file path for an API token
+
+    The path may be overridden with the `DO_RATE_LIMIT_FILE`
+    environment variable.  Otherwise, the file is named after a hash
+    of the token, so that separate accounts get separate budgets
+    without the token being exposed in the file name.
+    """
+    path = os.environ.get('DO_RATE_LIMIT_FILE', None)
+    if path is not None:
+        return path
+    token_hash = hashlib.sha1(api_token.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(),
+                        'do-ratelimit-{}.json'.format(token_hash))
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Return seconds to sleep before retry number `attempt`
+
+    A server-supplied `Retry-After` value wins; otherwise use "full
+    jitter" exponential backoff so that forks that were throttled
+    together don't retry together.
+    """
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after)) + random.uniform(0, 1)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class TokenBucket(object):
+    """Request budget shared between processes through a lock file"""
+
+    def __init__(self, path, capacity=BUCKET_CAPACITY, rate=BUCKET_RATE):
+        self.path = path
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+
+    def _locked(self, func):
+        """Run `func(state)` with the state file locked; write back the
+        state it returns"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, int('0600', 8))
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 4096)
+            try:
+                state = json.loads(raw.decode('utf-8')) if raw else {}
+            except ValueError:
+                state = {}
+            now = time.time()
+            if 'tokens' not in state:
+                state = dict(tokens=self.capacity, updated=now)
+            # Refill
+            elapsed = max(0.0, now - state['updated'])
+            state['tokens'] = min(self.capacity,
+                                  state['tokens'] + elapsed * self.rate)
+            state['updated'] = now
+            state, res = func(state, now)
+            data = json.dumps(state).encode('utf-8')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+            return res
+        finally:
+            os.close(fd)
+
+    def _take(self, state, now):
+        # The server's view of the budget overrides ours until reset
+        reset = state.get('reset', 0)
+        if state.get('remaining', 1) < 1 and reset > now:
+            return state, reset - now
+        if state['tokens'] >= 1:
+            state['tokens'] -= 1
+            return state, 0.0
+        return state, (1 - state['tokens']) / self.rate
+
+    def acquire(self):
+        """Block until a request may be made; return seconds waited"""
+        waited = 0.0
+        while True:
+            delay = self._locked(self._take)
+            if delay <= 0:
+                return waited
+            # Add a little jitter so waiting forks don't stampede
+            delay += random.uniform(0, 0.1 * delay)
+            time.sleep(delay)
+            waited += delay
+
+    def update(self, remaining=None, reset=None, retry_after=None):
+        """Record rate limit information returned by the server"""
+        def func(state, now):
+            if remaining is not None:
+                state['remaining'] = remaining
+                state['tokens'] = min(state['tokens'], float(remaining))
+            if reset is not None:
+                state['reset'] = reset
+            if retry_after is not None:
+                state['remaining'] = 0
+                state['reset'] = max(state.get('reset', 0),
+                                     now + retry_after)
+            return state, None
+        try:
+            self._locked(func)
+        except (IOError, OSError):
+            pass
+
+
+def droplet_addresses(droplet):
+    """Add flattened `ip_address`, `private_ip_address` and
+    `ip6_address` keys to a droplet dict, like `dopy` does for
+    `all_active_droplets()`; return the droplet"""
+    networks = droplet.get('networks', {})
+    droplet['ip_address'] = ''
+    for net in networks.get('v4', []):
+        if net['type'] == 'public':
+            droplet['ip_address'] = net['ip_address']
+        elif net['type'] == 'private':
+            droplet['private_ip_address'] = net['ip_address']
+    for net in networks.get('v6', []):
+        if net['type'] == 'public':
+            droplet['ip6_address'] = net['ip_address']
+    return droplet
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedDoManager(DoManager):
+    """`dopy` API v2 manager drawing on a shared request budget
+
+    Per-call timings are kept in `self.calls`; see `stats()`.
+    """
+
+    def __init__(self, api_token, bucket_file=None, max_retries=MAX_RETRIES):
+        super(RateLimitedDoManager, self).__init__(
+            None, api_token, api_version=2)
+        self.bucket = TokenBucket(bucket_file or rate_limit_file(api_token))
+        self.max_retries = max_retries
+        self.calls = []
+
+    def request_v2(self, url, headers={}, params={}, method='GET'):
+        headers = dict(headers, **{'Content-Type': 'application/json'})
+        call = dict(method=method, url=url, waited=0.0, retries=0)
+        self.calls.append(call)
+        start = time.time()
+
+        for attempt in range(self.max_retries + 1):
+            call['waited'] += self.bucket.acquire()
+
+            try:
+                if method == 'GET':
+                    resp = requests.get(
+                        url, headers=headers, params=params, timeout=60)
+                elif method in ('POST', 'PUT'):
+                    resp = requests.request(
+                        method, url, data=json.dumps(params),
+                        headers=headers, timeout=60)
+                elif method == 'DELETE':
+                    resp = requests.delete(url, headers=headers, timeout=60)
+                else:
+                    raise DoError('Unsupported method %s' % method)
+            except requests.exceptions.RequestException as e:
+                if attempt == self.max_retries:
+                    raise DoError('%s %s: %s' % (method, url, e))
+                delay = backoff_delay(attempt)
+            else:
+                retry_after = _int_header(resp.headers, 'Retry-After')
+                self.bucket.update(
+                    remaining=_int_header(resp.headers, 'RateLimit-Remaining'),
+                    reset=_int_header(resp.headers, 'RateLimit-Reset'),
+                    retry_after=(retry_after if resp.status_code == 429
+                                 else None))
+                if resp.status_code != 429 and resp.status_code < 500:
+                    break
+                if attempt == self.max_retries:
+                    break
+                delay = backoff_delay(attempt, retry_after)
+
+            call['retries'] += 1
+            call['waited'] += delay
+            time.sleep(delay)
+
+        call['status'] = resp.status_code
+        call['elapsed'] = time.time() - start
+
+        if resp.status_code == 204 or method == 'DELETE':
+            json_resp = dict(status=resp.status_code)
+        else:
+            try:
+                json_resp = resp.json()
+            except ValueError:
+                json_resp = dict()
+        if resp.status_code >= 400:
+            raise DoError(json_resp.get(
+                'message', '%s %s: HTTP %d' % (method, url, resp.status_code)))
+        return json_resp
+
+    def stats(self):
+        """Summarize time spent waiting on the request budget"""
+        return dict(
+            calls=len(self.calls),
+            retries=sum(c['retries'] for c in self.calls),
+            waited=round(sum(c['waited'] for c in self.calls), 3),
+            per_call=[dict(method=c['method'], url=c['url'],
+                           status=c.get('status'),
+                           retries=c['retries'],
+                           waited=round(c['waited'], 3),
+                           elapsed=round(c.get('elapsed', 0), 3))
+                      for c in self.calls],
+        )
+
+    def _all_pages(self, path, key, **params):
+        """List all objects from a paginated API path"""
+        objs = []
+        page = 1
+        while True:
+            params.update(page=page, per_page=LIST_PAGE_SIZE)
+            resp = self.request(path, params)
+            objs.extend(resp.get(key, []))
+            if not resp.get('links', {}).get('pages', {}).get('next'):
+                return objs
+            page += 1
+
+    def all_droplets(self, tag_name=None):
+        """List all droplets, optionally with a tag"""
+        params = dict(tag_name=tag_name) if tag_name is not None else {}
+        return [droplet_addresses(d)
+                for d in self._all_pages('/droplets', 'droplets', **params)]
+
+    def new_droplets(self, names, size, image, region, ssh_key_ids=None,
+                     user_data=None, tags=None, private_networking=False,
+                     ipv6=False):
+        """Create droplets with identical settings in as few requests as
+        the API allows; return the list of new droplet dicts"""
+        droplets = []
+        for i in range(0, len(names), CREATE_BATCH_SIZE):
+            params = dict(
+                names=names[i:i + CREATE_BATCH_SIZE],
+                size=size, image=image, region=region,
+                private_networking=private_networking, ipv6=ipv6)
+            if ssh_key_ids:
+                params['ssh_keys'] = ssh_key_ids
+            if user_data:
+                params['user_data'] = user_data
+            if tags:
+                params['tags'] = tags
+            resp = self.request('/droplets', params, 'POST')
+            droplets.extend(resp.get('droplets', []))
+        return droplets
+
+    def all_volumes(self, region=None):
+        """List all block storage volumes, optionally in a region"""
+        params = dict(region=region) if region is not None else {}
+        return self._all_pages('/volumes', 'volumes', **params)
+
+    def new_volume(self, name, size, region, description=None):
+        """Create a block storage volume; return the volume dict"""
+        params = dict(name=name, size_gigabytes=int(size), region=region)
+        if description is not None:
+            params['description'] = description
+        return self.request('/volumes', params, 'POST')['volume']
+
+    def attach_volume(self, volume_id, droplet_id, region):
+        """Start attaching a volume to a droplet; return the action dict"""
+        params = dict(type='attach', droplet_id=int(droplet_id),
+                      region=region)
+        return self.request(
+            '/volumes/%s/actions' % volume_id, params, 'POST')['action']
+
+    def detach_volume(self, volume_id, droplet_id, region):
+        """Start detaching a volume from a droplet; return the action dict"""
+        params = dict(type='detach', droplet_id=int(droplet_id),
+                      region=region)
+        return self.request(
+            '/volumes/%s/actions' % volume_id, params, 'POST')['action']
+
+    def delete_volume(self, volume_id):
+        """Delete a block storage volume"""
+        return self.request('/volumes/%s' % volume_id, {}, 'DELETE')
+
+    def delete_droplet(self, droplet_id):
+        """Delete a droplet"""
+        return self.request('/droplets/%s' % droplet_id, {}, 'DELETE')
+
+    def wait_action(self, action_id, timeout=300, interval=2):
+        """Wait for an action to complete; return the action dict"""
+        deadline = time.time() + timeout
+        while True:
+            action = self.request('/actions/%s' % action_id)['action']
+            if action['status'] == 'completed':
+                return action
+            if action['status'] == 'errored':
+                raise DoError('Action %s (%s) errored' % (
+                    action_id, action.get('type')))
+            if time.time() > deadline:
+                raise DoError('Timed out waiting for action %s (%s)' % (
+                    action_id, action.get('type')))
+            time.sleep(interval)
+
+
+class DropletPoller(object):
+    """Wait for droplets to become active, sharing one droplet listing
+    per interval among all waiting threads"""
+
+    def __init__(self, manager, interval=5):
+        self.manager = manager
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last = 0
+        self.droplets = {}
+        self.polls = 0
+
+    def poll(self):
+        """Refresh the droplet listing if it is older than the interval"""
+        with self.lock:
+            if time.time() - self.last >= self.interval:
+                self.droplets = dict(
+                    (d['name'], d) for d in self.manager.all_droplets())
+                self.last = time.time()
+                self.polls += 1
+            return self.droplets, self.last
+
+    def wait_active(self, name, deadline):
+        """Return the droplet dict once it is active with a public IP"""
+        while True:
+            droplets, last = self.poll()
+            droplet = droplets.get(name, None)
+            if droplet is not None and droplet['status'] == 'active' \
+               and droplet['ip_address']:
+                return droplet
+            if time.time() > deadline:
+                raise DoError(
+                    'Timed out waiting for droplet %s to become active' % name)
+            time.sleep(max(0.1, last + self.interval - time.time()))
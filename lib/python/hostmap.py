@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Host address map shared by the address filter plugins
+#
+# Each `hostvars[host]` access templates that host's variables, and
+# filters like `ip_addr_list` and `freeipa_dns_server_ips` used to do
+# that for every host on every template render.  `build()` walks
+# `hostvars` once and returns a plain dict, which may be saved as a
+# fact (see the `digitalocean-ips` role) and passed to the filters in
+# place of `hostvars`:
+#
+# { host_address_map: True,
+#   hosts: {
+#     host1: {
+#       ipv4: '192.168.42.12',
+#       ipv6: '2604:a880:800:10::1',
+#       ipa_ip_addr: '10.1.1.1',
+#       groups: [ 'coreos', 'freeipa_master', ... ],
+#     },
+#     [...]
+#   },
+#   groups: { all: [ host1, ... ], coreos: [ ... ], ... },
+# }
+
+MARKER = 'host_address_map'
+
+
+def is_map(data):
+    """Return True if `data` is a map returned by `build()`"""
+    return isinstance(data, dict) and data.get(MARKER, False) is True
+
+
+def _get(hv, *keys):
+    """Return the value at a key path in host vars, or None if any key is
+    missing or fails to template"""
+    try:
+        for key in keys:
+            if hv is None or key not in hv:
+                return None
+            hv = hv[key]
+    except Exception:
+        # e.g. AnsibleUndefinedVariable while templating
+        return None
+    return hv
+
+
+def droplet_facts(hv):
+    """Return a host's `do_droplet_facts`, or an empty dict if there are
+    none or they belong to another droplet than the host's current one,
+    e.g. cached facts from before a rebuild
+
+    The current droplet is the host's `droplet_id`, set when creating
+    it, or the `do_droplet` result of `do_droplet_info`.
+    """
+    facts = _get(hv, 'do_droplet_facts') or {}
+    droplet_id = _get(hv, 'droplet_id') or _get(hv, 'do_droplet', 'id')
+    if droplet_id is not None and str(facts.get('id')) != str(droplet_id):
+        return {}
+    return facts
+
+
+def host_record(hv):
+    """Extract the address record for one host's vars
+
+    Addresses from `do_droplet_info` are authoritative; gathered facts,
+    which go stale in the fact cache when a droplet is rebuilt, are only
+    used for hosts without droplet facts.
+    """
+    facts = droplet_facts(hv)
+    return dict(
+        ipv4=(facts.get('public_ipv4')
+              or _get(hv, 'ip_addr')
+              or _get(hv, 'ansible_default_ipv4', 'address')),
+        ipv6=(facts.get('public_ipv6')
+              or _get(hv, 'ansible_default_ipv6', 'address')),
+        ipa_ip_addr=_get(hv, 'ipa_ip_addr'),
+        groups=list(_get(hv, 'group_names') or []),
+    )
+
+
+def build(hostvars, host_list=None):
+    """Build the address map for `host_list`, default all hosts"""
+    if is_map(hostvars):
+        return hostvars
+    if host_list is None:
+        host_list = list(hostvars)
+    hosts = dict((h, host_record(hostvars[h])) for h in host_list)
+    groups = {}
+    for h in host_list:
+        groups = _get(hostvars[h], 'groups')
+        if groups is not None:
+            break
+    return {
+        MARKER: True,
+        'hosts': hosts,
+        'groups': dict((g, list(m)) for g, m in (groups or {}).items()),
+    }
@@ -41,7 +41,7 @@ from ansible.module_utils._text import to_bytes, to_text
 from ansible.module_utils.pycompat24 import get_exception
 from ansible.module_utils.six import PY3
 from ansible.module_utils.six.moves.urllib.parse import quote
-from ansible.module_utils.urls import fetch_url
+from ansible.module_utils.urls import fetch_url, open_url
 from ansible.module_utils.basic import AnsibleModule
 
 
@@ -677,3 +677,65 @@ class EnablableIPAClient(IPAClient):
         self.requests.append(dict(name = 'enable_or_disable',
                                   request = request ))
 
+
+class IPASessionError(Exception):
+    def __init__(self, msg, code=None):
+        super(IPASessionError, self).__init__(msg)
+        self.code = code
+
+
+class IPASession(object):
+    """Minimal IPA JSON API client for use outside of modules, e.g. in
+    action plugins, where there is no `AnsibleModule` object"""
+
+    # IPA error code for `NotFound`
+    NOT_FOUND = 4001
+
+    def __init__(self, host, user, password, protocol='https',
+                 validate_certs=True, timeout=10):
+        self.base_url = '%s://%s/ipa' % (protocol, host)
+        self.user = user
+        self.password = password
+        self.validate_certs = validate_certs
+        self.timeout = timeout
+        self.headers = None
+
+    def login(self):
+        data = 'user=%s&password=%s' % \
+               (quote(self.user, safe=''), quote(self.password, safe=''))
+        headers = {'referer': self.base_url,
+                   'Content-Type': 'application/x-www-form-urlencoded',
+                   'Accept': 'text/plain'}
+        try:
+            resp = open_url(
+                '%s/session/login_password' % self.base_url,
+                data=to_bytes(data), headers=headers, method='POST',
+                validate_certs=self.validate_certs, timeout=self.timeout)
+        except Exception:
+            e = get_exception()
+            raise IPASessionError('login: %s' % e)
+        self.headers = {'referer': self.base_url,
+                        'Content-Type': 'application/json',
+                        'Accept': 'application/json',
+                        'Cookie': resp.info().get('Set-Cookie')}
+
+    def call(self, method, args=None, options=None):
+        """Call an API method; return its `result`"""
+        if self.headers is None:
+            self.login()
+        data = {'method': method, 'params': [args or [], options or {}]}
+        try:
+            resp = open_url(
+                '%s/session/json' % self.base_url,
+                data=to_bytes(json.dumps(data)), headers=self.headers,
+                method='POST', validate_certs=self.validate_certs,
+                timeout=self.timeout)
+        except Exception:
+            e = get_exception()
+            raise IPASessionError('post %s: %s' % (method, e))
+        resp = json.loads(to_text(resp.read()))
+        err = resp.get('error')
+        if err is not None:
+            raise IPASessionError('response %s: %s' % (
+                method, err.get('message', err)), err.get('code'))
+        return resp.get('result', {})
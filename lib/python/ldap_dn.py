@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# RFC 4514 distinguished name parsing and formatting
+#
+# Shared by the `cn_from_dn` and `domain_to_dn` filters and the
+# `ipa_cert` module.  A parsed DN is a tuple of RDNs, leaf first as
+# written, each a tuple of (attribute, value) pairs; multi-valued RDNs
+# like `CN=a+UID=b` have more than one pair:
+#
+# parse('CN=Smith\, J.+UID=js,O=EXAMPLE.COM')
+#   -> ((('CN', 'Smith, J.'), ('UID', 'js')), (('O', 'EXAMPLE.COM'),))
+#
+# Hex-encoded `#...` values are kept as strings, undecoded.  Parses
+# are memoized, since IPA `cert_find` results repeat the same issuer
+# and subject DNs many times.
+
+import binascii
+from collections import OrderedDict
+
+# Characters escaped with a backslash in attribute values
+_specials = ',+"\\<>;='
+
+_hexdigits = '0123456789abcdefABCDEF'
+
+# Memoized `parse()` results, least recently used first
+_cache = OrderedDict()
+_CACHE_SIZE = 4096
+
+
+class DNError(ValueError):
+    pass
+
+
+def _parse(dn):
+    rdns = []
+    rdn = []
+    i, n = 0, len(dn)
+    while i < n:
+        # Attribute type
+        while i < n and dn[i] == ' ':
+            i += 1
+        j = dn.find('=', i)
+        if j < 0:
+            raise DNError("Missing '=' in DN: %s" % dn)
+        attr = dn[i:j].strip()
+        if not attr:
+            raise DNError("Empty attribute type in DN: %s" % dn)
+        i = j + 1
+        while i < n and dn[i] == ' ':
+            i += 1
+
+        # Attribute value; `keep` is the length without unescaped
+        # trailing spaces
+        buf = []
+        keep = 0
+        raw = bytearray()
+        if i < n and dn[i] == '#':
+            j = i + 1
+            while j < n and dn[j] not in ',+':
+                j += 1
+            buf.append(dn[i:j].rstrip())
+            keep = 1
+            i = j
+        while i < n and dn[i] not in ',+':
+            c = dn[i]
+            if c == '\\':
+                pair = dn[i + 1:i + 3]
+                if len(pair) == 2 and pair[0] in _hexdigits \
+                   and pair[1] in _hexdigits:
+                    raw.extend(binascii.unhexlify(pair))
+                    i += 3
+                    continue
+                if not pair or pair[0] not in _specials + ' #':
+                    raise DNError("Bad escape in DN: %s" % dn)
+                c = dn[i + 1]
+                i += 1
+                escaped = True
+            else:
+                escaped = False
+            if raw:
+                try:
+                    buf.append(raw.decode('utf-8'))
+                except UnicodeDecodeError:
+                    raise DNError("Bad UTF-8 escape in DN: %s" % dn)
+                raw = bytearray()
+                keep = len(buf)
+            buf.append(c)
+            if escaped or c != ' ':
+                keep = len(buf)
+            i += 1
+        if raw:
+            try:
+                buf.append(raw.decode('utf-8'))
+            except UnicodeDecodeError:
+                raise DNError("Bad UTF-8 escape in DN: %s" % dn)
+            keep = len(buf)
+        rdn.append((attr, ''.join(buf[:keep])))
+
+        # Separator
+        if i < n and dn[i] == '+':
+            i += 1
+            continue
+        rdns.append(tuple(rdn))
+        rdn = []
+        if i < n:
+            i += 1
+            if i == n:
+                raise DNError("Trailing ',' in DN: %s" % dn)
+    if rdn:
+        rdns.append(tuple(rdn))
+    return tuple(rdns)
+
+
+def parse(dn):
+    """Parse a DN string into a tuple of RDNs; raise `DNError` if it is
+    malformed"""
+    try:
+        res = _cache.pop(dn)
+    except KeyError:
+        res = _parse(dn)
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.popitem(last=False)
+    _cache[dn] = res
+    return res
+
+
+def parse_many(dns):
+    """Parse a list of DN strings; malformed DNs give None"""
+    res = []
+    for dn in dns:
+        try:
+            res.append(parse(dn))
+        except DNError:
+            res.append(None)
+    return res
+
+
+def escape_value(value):
+    """Escape an attribute value for use in a DN string"""
+    res = ''.join('\\' + c if c in _specials else
+                  '\\00' if c == '\0' else c for c in value)
+    if res.startswith((' ', '#')):
+        res = '\\' + res
+    if value.endswith(' ') and len(value) > 1:
+        res = res[:-1] + '\\ '
+    return res
+
+
+def format_dn(rdns):
+    """Format a tuple of RDNs as returned by `parse()` into a DN string"""
+    return ','.join(
+        '+'.join('%s=%s' % (attr, escape_value(value)) for attr, value in rdn)
+        for rdn in rdns)
+
+
+def get_attr(dn, attr, default=None):
+    """Return the first value of attribute `attr` (case-insensitive) in
+    a DN string, or `default` if absent or the DN is malformed"""
+    attr = attr.lower()
+    try:
+        rdns = parse(dn)
+    except DNError:
+        return default
+    for rdn in rdns:
+        for a, value in rdn:
+            if a.lower() == attr:
+                return value
+    return default
+
+
+def get_attr_many(dns, attr, default=None):
+    """Return `get_attr()` for each of a list of DN strings"""
+    return [get_attr(dn, attr, default) for dn in dns]
+
+
+def domain_to_dn(domain):
+    """Convert a domain name to a DN, e.g. example.com to
+    dc=example,dc=com"""
+    return format_dn(tuple((('dc', label),) for label in domain.split('.')))
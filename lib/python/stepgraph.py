@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# Run a dependency graph of provisioning steps concurrently
+#
+# Steps are plain callables registered with the names of the steps
+# they depend on.  `StepGraph.run()` starts every step whose
+# dependencies have completed, up to `max_workers` at a time, so that
+# independent work (e.g. creating a volume while its droplet boots)
+# overlaps.  A step whose dependency failed is skipped; a step may also
+# run `after` others, whatever their outcome.  The run
+# returns a timeline of when each step started and finished, to show
+# where the time went.
+
+import threading
+import time
+
+
+class StepGraphError(Exception):
+    pass
+
+
+class Step(object):
+
+    def __init__(self, name, func, deps, after, host):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.after = list(after)
+        self.host = host
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+
+
+class StepGraph(object):
+
+    def __init__(self):
+        self.steps = {}
+        self.order = []
+        self.cond = threading.Condition()
+
+    def add(self, name, func, deps=(), host=None, after=()):
+        """Add a step named `name` running `func()` once `deps` have
+        succeeded and `after` have ended, failed or not"""
+        if name in self.steps:
+            raise StepGraphError("Duplicate step '%s'" % name)
+        self.steps[name] = Step(name, func, deps, after, host)
+        self.order.append(name)
+
+    def result(self, name):
+        """Return the value returned by a completed step"""
+        return self.steps[name].result
+
+    def check(self):
+        """Raise `StepGraphError` on unknown deps or cycles"""
+        visiting, visited = set(), set()
+
+        def visit(name, path):
+            if name not in self.steps:
+                raise StepGraphError(
+                    "Step '%s' depends on unknown step '%s'" % (path[-1], name))
+            if name in visited:
+                return
+            if name in visiting:
+                raise StepGraphError(
+                    "Dependency cycle:  %s" % ' -> '.join(path + [name]))
+            visiting.add(name)
+            for dep in self.steps[name].deps + self.steps[name].after:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.order:
+            visit(name, [])
+
+    def _run_step(self, step):
+        status = 'failed'
+        try:
+            step.result = step.func()
+            status = 'ok'
+        except Exception as e:
+            step.error = str(e)
+        except BaseException as e:
+            # e.g. `SystemExit` from `fail_json()`; the step must still
+            # end, or `run()` would wait for it forever
+            step.error = '%s: %s' % (type(e).__name__, e)
+            raise
+        finally:
+            with self.cond:
+                step.end = time.time()
+                step.status = status
+                self.cond.notify_all()
+
+    def run(self, max_workers=8):
+        """Run all steps; return True if none failed"""
+        self.check()
+        self.t0 = time.time()
+        with self.cond:
+            while True:
+                running = sum(1 for s in self.steps.values()
+                              if s.status == 'running')
+                progress = False
+                for name in self.order:
+                    step = self.steps[name]
+                    if step.status != 'pending':
+                        continue
+                    deps = [self.steps[d].status for d in step.deps]
+                    if any(s in ('failed', 'skipped') for s in deps):
+                        step.status = 'skipped'
+                        step.error = 'dependency failed'
+                        progress = True
+                        continue
+                    after = [self.steps[d].status for d in step.after]
+                    if running >= max_workers \
+                       or any(s != 'ok' for s in deps) \
+                       or any(s in ('pending', 'running') for s in after):
+                        continue
+                    step.status = 'running'
+                    step.start = time.time()
+                    running += 1
+                    thread = threading.Thread(target=self._run_step,
+                                              args=(step,))
+                    thread.daemon = True
+                    thread.start()
+
+                if running:
+                    self.cond.wait()
+                elif not progress:
+                    break
+
+        return not any(s.status == 'failed' for s in self.steps.values())
+
+    def failures(self):
+        """Return a dict of failed step names to error messages"""
+        return dict((s.name, s.error) for s in self.steps.values()
+                    if s.status == 'failed')
+
+    def timeline(self):
+        """Return a list of step timings relative to the run start"""
+        res = []
+        for name in self.order:
+            step = self.steps[name]
+            item = dict(step=name, host=step.host, status=step.status)
+            if step.start is not None:
+                item['start'] = round(step.start - self.t0, 2)
+                item['end'] = round(step.end - self.t0, 2)
+                item['duration'] = round(step.end - step.start, 2)
+            if step.error is not None:
+                item['error'] = step.error
+            res.append(item)
+        return sorted(res, key=lambda i: (i.get('start', float('inf')),
+                                          i['step']))